@@ -0,0 +1,173 @@
+"""Офлайн-бенчмарк парсера: MAL заменён локальным сервером, Google — фейковым переводчиком.
+
+Пример:
+    python -m benchmarks.bench_parser --ticks 50 --latency-ms 40 --failure-rate 0.02 \
+        --translate-delay-ms 150 --output bench.json --compare bench_prev.json
+
+Стадии: listing_fetch, html_parse, feed_parse, article_fetch, fix_image_url, translate, tick.
+Для каждой — пропускная способность, p50/p99, CPU процесса бота и пиковая память (tracemalloc).
+Сервер работает в отдельном процессе, поэтому его CPU и память в замеры не попадают.
+Картинки тоже отдаёт он, а кеш картинок пишется во временный каталог, не в data/.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import aiohttp
+
+from benchmarks.fake_translator import FakeTranslator
+from benchmarks.stand_in import FIXTURES
+from benchmarks.stats import compare, git_revision, summarize
+from bot import parser as bot_parser
+from bot.config import config
+from bot.governor import TokenBucket, get_governor
+from bot.images import resolver
+from bot.sources import mal
+
+
+async def measure(fn, iterations: int):
+    """Гоняет fn(i) iterations раз; затем ещё один прогон под tracemalloc ради пиковой памяти"""
+    latencies = []
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    for i in range(iterations):
+        started = time.perf_counter()
+        result = fn(i)
+        if inspect.isawaitable(result):
+            await result
+        latencies.append(time.perf_counter() - started)
+    wall, cpu = time.perf_counter() - wall_started, time.process_time() - cpu_started
+
+    tracemalloc.start()
+    result = fn(0)
+    if inspect.isawaitable(result):
+        await result
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(latencies, wall, cpu, peak / 1024)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stand_in(args) -> (subprocess.Popen, str):
+    port = _free_port()
+    cmd = [sys.executable, "-m", "benchmarks.stand_in", "--port", str(port),
+           "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+           "--failure-rate", str(args.failure_rate), "--seed", str(args.seed)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()  # "stand-in listening on ..."
+    return proc, f"http://127.0.0.1:{port}"
+
+
+async def run(args) -> dict:
+    proc, base = start_stand_in(args)
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        # MAL → локальный сервер, Google → фейк
+        mal.MAL_NEWS_URL = f"{base}/news"
+        mal.MAL_NEWS_RSS_URL = f"{base}/rss/news.xml"
+        os.environ["SOURCE_MAL_LISTING"] = args.listing
+        bot_parser.translator = FakeTranslator(args.translate_delay_ms)
+        resolver.__init__(path=Path(tmp.name) / "images.json", image_dir=Path(tmp.name) / "images", rehost=False)
+        governor = get_governor(base)
+        governor.bucket = TokenBucket(args.rate, args.burst)
+
+        listing_html = (FIXTURES / "listing.html").read_text(encoding="utf-8").replace("{base}", base)
+        feed_xml = (FIXTURES / "news.xml").read_text(encoding="utf-8").replace("{base}", base)
+        entries = mal.parse_listing_html(listing_html, args.limit)
+        links = [e["link"] for e in entries]
+        images = [e["image"] for e in entries]
+        texts = [e["excerpt"] for e in entries]
+
+        stages = {}
+        async with aiohttp.ClientSession() as session:
+            stages["listing_fetch"] = await measure(lambda i: mal.MALSource().fetch(session, args.limit), args.ticks)
+            stages["article_fetch"] = await measure(
+                lambda i: bot_parser.fetch_full_text(session, links[i % len(links)]), args.ticks)
+
+        stages["html_parse"] = await measure(lambda i: mal.parse_listing_html(listing_html, args.limit), args.ticks)
+        stages["feed_parse"] = await measure(lambda i: _parse_feed(feed_xml, args.limit), args.ticks)
+        stages["fix_image_url"] = await measure(lambda i: mal.fix_image_url(images[i % len(images)]), args.ticks * 100)
+        stages["translate"] = await measure(lambda i: bot_parser.translate_to_ru(texts[i % len(texts)]), args.ticks)
+
+        # Тик: каждый раз new_per_tick записей считаются новыми, остальные — уже известными
+        def tick(i):
+            fresh = {links[(i * args.new_per_tick + k) % len(links)] for k in range(args.new_per_tick)}
+            return mal.MALSource().poll(limit=args.limit, is_known=lambda item_id: item_id not in fresh)
+
+        stages["tick"] = await measure(tick, args.ticks)
+
+        return {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "stages": stages,
+            "governor": governor.snapshot(),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+        tmp.cleanup()
+
+
+def _parse_feed(xml_text: str, limit: int):
+    # тот же разбор, что и в fetch_feed_entries, но без сети — чистая стоимость XML
+    parser = ET.XMLPullParser(events=("end",))
+    parser.feed(xml_text)
+    found = []
+    for _, elem in parser.read_events():
+        if bot_parser._local(elem.tag) in ("item", "entry"):
+            found.append(bot_parser._feed_entry(elem))
+            elem.clear()
+            if len(found) >= limit:
+                break
+    return found
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ticks", type=int, default=20, help="итераций на стадию")
+    ap.add_argument("--limit", type=int, default=config.NEWS_LIMIT, help="записей в списке за тик")
+    ap.add_argument("--new-per-tick", type=int, default=1, help="сколько записей за тик считаются новыми")
+    ap.add_argument("--listing", choices=("rss", "html"), default="rss")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--failure-rate", type=float, default=0.0)
+    ap.add_argument("--translate-delay-ms", type=float, default=0.0)
+    ap.add_argument("--rate", type=float, default=1000.0, help="лимит governor, запросов/с")
+    ap.add_argument("--burst", type=int, default=100)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--output", help="куда записать JSON с результатами")
+    ap.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = ap.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"\nCompared with {baseline.get('revision')}:")
+        for line in compare(result, baseline):
+            print("  " + line)
+
+
+if __name__ == "__main__":
+    main()
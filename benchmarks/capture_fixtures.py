@@ -0,0 +1,30 @@
+"""Обновляет benchmarks/fixtures настоящими страницами MyAnimeList.
+
+Ссылки на новости и на CDN заменяются на {base}, чтобы локальный сервер мог подставить свой адрес.
+Запускать вручную и изредка: python -m benchmarks.capture_fixtures
+"""
+import asyncio
+
+import aiohttp
+
+from benchmarks.stand_in import FIXTURES
+from bot.parser import fetch_page
+from bot.sources import mal
+
+
+async def capture():
+    async with aiohttp.ClientSession() as session:
+        listing = await fetch_page(session, mal.MAL_NEWS_URL)
+        feed = await fetch_page(session, mal.MAL_NEWS_RSS_URL)
+        first = mal.parse_listing_html(listing, 1)
+        article = await fetch_page(session, first[0]["link"]) if first else ""
+
+    for name, text in (("listing.html", listing), ("news.xml", feed), ("article.html", article)):
+        text = text.replace("https://myanimelist.net/news", "{base}/news")
+        text = text.replace("https://cdn.myanimelist.net/", "{base}/cdn/")
+        (FIXTURES / name).write_text(text, encoding="utf-8")
+        print(f"saved {name} ({len(text)} chars)")
+
+
+if __name__ == "__main__":
+    asyncio.run(capture())
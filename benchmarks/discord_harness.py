@@ -0,0 +1,612 @@
+"""Нагрузочный стенд для кога Moderation без живого сервера Discord.
+
+Ког работает с настоящими объектами discord.py, но HTTPClient.request подменён
+фейком: он хранит каналы, сообщения и реакции в памяти, записывает каждый
+REST-вызов по route и имитирует rate limit (429 → ожидание, как у discord.py).
+
+Пример:
+    python -m benchmarks.discord_harness --scenario reaction_storm --reactions 500 --seconds 10 \
+        --output harness.json
+
+Сценарии: news_burst, history_scan, reaction_storm, concurrent_approvals, restart_mid_publish, bulk_approve,
+startup_reconcile, approve_races, offline_decisions.
+С --ha блокировки публикаций идут через общий SQLite (как в режиме HA_ENABLED), а рестарт
+получает новый id экземпляра — как новый процесс. С --digest новости тика уходят дайджестом (DIGEST_MODE).
+В отчёте: REST-вызовы всего/по route/на событие, задержка обработчика (p50/p99), дубли публикаций.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.parse import unquote
+
+import discord
+from discord.ext import commands
+from discord.http import Route
+
+from benchmarks.stats import git_revision, percentile
+from bot.config import config, GuildConfig
+from bot.ha import ha
+from bot.pending import pending
+from bot.reconcile import index
+from bot.sources.base import NewsSource
+from bot.storage import storage
+
+GUILD_ID = 1
+BOT_ID = 1000
+MODERATOR_ROLE_ID = 50
+MODERATION_CHANNEL_ID = 100
+FORUM_CHANNEL_ID = 200
+APPROVED_CHANNEL_ID = 300
+MODERATORS = list(range(2000, 2010))
+USERS = list(range(3000, 3050))
+
+# (лимит, окно в секундах) по route — порядок величин как у Discord
+RATE_LIMITS = {
+    "POST /channels/{channel_id}/messages": (5, 5.0),
+    "PUT /channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me": (1, 0.25),
+    "POST /channels/{channel_id}/threads": (5, 5.0),
+}
+DEFAULT_RATE_LIMIT = (50, 1.0)
+
+
+def _user(user_id: int, bot: bool = False) -> dict:
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0",
+            "global_name": None, "avatar": None, "bot": bot}
+
+
+def _timestamp() -> str:
+    return discord.utils.utcnow().isoformat()
+
+
+class _Bucket:
+    def __init__(self, limit: int, per: float):
+        self.limit, self.per = limit, per
+        self.tokens, self.updated = float(limit), time.monotonic()
+
+    def wait_time(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.limit / self.per)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) * self.per / self.limit
+
+
+class FakeDiscord:
+    """Фейковый REST Discord: состояние в памяти, учёт вызовов и rate limit по route"""
+
+    def __init__(self, latency_ms: float = 0.0, rate_limits: bool = True):
+        self.latency_ms = latency_ms
+        self.rate_limits = rate_limits
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+        self.rate_limit_wait_s = 0.0
+        self.unhandled: Counter = Counter()
+        self.channels: Dict[int, dict] = {}
+        self.messages: Dict[int, Dict[int, dict]] = defaultdict(dict)  # channel -> message_id -> json
+        self.reactions: Dict[int, Dict[str, set]] = defaultdict(lambda: defaultdict(set))
+        self.members: Dict[int, dict] = {}
+        self.published: Counter = Counter()  # embed.url -> сколько раз опубликовано
+        # Хук для имитации падения: fail_on(route_key, params) -> исключение или None
+        self.fail_on: Optional[Callable[[str, dict], Optional[BaseException]]] = None
+        self._buckets: Dict[str, _Bucket] = {}
+        self._next_id = 10_000
+        self._handlers = [
+            ("POST", "/channels/{channel_id}/messages", self._create_message),
+            ("PUT", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me", self._add_reaction),
+            ("GET", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}", self._reaction_users),
+            ("GET", "/channels/{channel_id}/messages/{message_id}", self._get_message),
+            ("GET", "/channels/{channel_id}/messages", self._logs_from),
+            ("POST", "/channels/{channel_id}/threads", self._start_thread),
+            ("GET", "/channels/{channel_id}/threads/archived/public", self._archived_threads),
+            ("GET", "/channels/{channel_id}", self._get_channel),
+            ("GET", "/guilds/{guild_id}/members/{user_id}", self._get_member),
+        ]
+        self._patterns = [
+            (method, path, re.compile("^" + re.sub(r"\\{(\w+)\\}", r"(?P<\1>[^/]+)", re.escape(path)) + "$"), fn)
+            for method, path, fn in self._handlers
+        ]
+
+    def new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    # --- точка входа вместо HTTPClient.request ---
+
+    async def request(self, route: Route, *, files=None, form=None, **kwargs):
+        key = route.key
+        self.calls[key] += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        if self.rate_limits:
+            limit, per = RATE_LIMITS.get(route.path, DEFAULT_RATE_LIMIT)
+            bucket = self._buckets.setdefault(f"{key}:{route.major_parameters}", _Bucket(limit, per))
+            wait = bucket.wait_time()
+            if wait > 0:
+                # discord.py получил бы 429 и проспал retry_after
+                self.rate_limited[key] += 1
+                self.rate_limit_wait_s += wait
+                await asyncio.sleep(wait)
+
+        path = route.url[len(Route.BASE):].split("?", 1)[0]
+        for method, template, pattern, fn in self._patterns:
+            m = pattern.match(path)
+            if method == route.method and m:
+                params = {k: unquote(v) for k, v in m.groupdict().items()}
+                if self.fail_on:
+                    exc = self.fail_on(key, params)
+                    if exc is not None:
+                        raise exc
+                return fn(params, kwargs.get("json"), kwargs.get("params"))
+        self.unhandled[key] += 1
+        return None
+
+    # --- мир ---
+
+    def add_channel(self, channel_id: int, name: str, type_: int):
+        data = {"id": str(channel_id), "type": type_, "name": name, "position": len(self.channels),
+                "guild_id": str(GUILD_ID), "permission_overwrites": [], "nsfw": False, "parent_id": None}
+        if type_ == 15:
+            data.update(available_tags=[], default_reaction_emoji=None, flags=0)
+        self.channels[channel_id] = data
+        return data
+
+    def member_json(self, user_id: int) -> dict:
+        roles = [str(MODERATOR_ROLE_ID)] if user_id in MODERATORS else []
+        return {"user": _user(user_id, bot=user_id == BOT_ID), "roles": roles, "joined_at": _timestamp(),
+                "deaf": False, "mute": False, "flags": 0}
+
+    def guild_json(self) -> dict:
+        return {
+            "id": str(GUILD_ID), "name": "harness", "owner_id": str(BOT_ID), "member_count": 1,
+            "roles": [
+                {"id": str(GUILD_ID), "name": "@everyone", "permissions": str(discord.Permissions.all().value),
+                 "position": 0, "color": 0, "hoist": False, "managed": False, "mentionable": False},
+                {"id": str(MODERATOR_ROLE_ID), "name": "moderators", "permissions": "0",
+                 "position": 1, "color": 0, "hoist": False, "managed": False, "mentionable": False},
+            ],
+            "channels": list(self.channels.values()),
+            "members": [self.member_json(BOT_ID)],
+        }
+
+    def user_react(self, channel_id: int, message_id: int, emoji: str, user_id: int):
+        self.reactions[message_id][emoji].add(user_id)
+
+    # --- обработчики route ---
+
+    def _message_json(self, channel_id: int, message_id: int) -> dict:
+        msg = dict(self.messages[channel_id][message_id])
+        msg["reactions"] = [
+            {"emoji": {"id": None, "name": emoji}, "count": len(users), "me": BOT_ID in users,
+             "me_burst": False, "count_details": {"burst": 0, "normal": len(users)}, "burst_colors": []}
+            for emoji, users in self.reactions[message_id].items() if users
+        ]
+        return msg
+
+    def _store_message(self, channel_id: int, payload: dict, message_id: Optional[int] = None) -> dict:
+        message_id = message_id or self.new_id()
+        self.messages[channel_id][message_id] = {
+            "id": str(message_id), "channel_id": str(channel_id), "guild_id": str(GUILD_ID),
+            "author": _user(BOT_ID, bot=True), "content": payload.get("content") or "",
+            "timestamp": _timestamp(), "edited_timestamp": None, "tts": False, "mention_everyone": False,
+            "mentions": [], "mention_roles": [], "attachments": [], "embeds": payload.get("embeds") or [],
+            "pinned": False, "type": 0, "flags": 0,
+        }
+        return self._message_json(channel_id, message_id)
+
+    def _create_message(self, params, payload, query):
+        channel_id = int(params["channel_id"])
+        if channel_id == APPROVED_CHANNEL_ID:
+            for embed in (payload or {}).get("embeds") or []:
+                self.published[embed.get("url")] += 1
+        return self._store_message(channel_id, payload or {})
+
+    def _add_reaction(self, params, payload, query):
+        self.reactions[int(params["message_id"])][params["emoji"]].add(BOT_ID)
+
+    def _get_message(self, params, payload, query):
+        channel_id, message_id = int(params["channel_id"]), int(params["message_id"])
+        if message_id not in self.messages[channel_id]:
+            raise discord.NotFound(_FakeResponse(404), {"message": "Unknown Message", "code": 10008})
+        return self._message_json(channel_id, message_id)
+
+    def _reaction_users(self, params, payload, query):
+        query = query or {}
+        users = sorted(self.reactions[int(params["message_id"])][params["emoji"]])
+        if query.get("after"):
+            users = [u for u in users if u > int(query["after"])]
+        return [_user(u, bot=u == BOT_ID) for u in users[:int(query.get("limit", 25))]]
+
+    def _logs_from(self, params, payload, query):
+        channel_id = int(params["channel_id"])
+        query = query or {}
+        ids = sorted(self.messages[channel_id], reverse=True)
+        limit = int(query.get("limit", 50))
+        if query.get("before"):
+            ids = [i for i in ids if i < int(query["before"])]
+        if query.get("after"):
+            # Discord отдаёт ближайшие после after, новые первыми
+            ids = [i for i in ids if i > int(query["after"])][-limit:]
+        return [self._message_json(channel_id, i) for i in ids[:limit]]
+
+    def _start_thread(self, params, payload, query):
+        parent_id = int(params["channel_id"])
+        payload = payload or {}
+        thread_id = self.new_id()
+        thread = {
+            "id": str(thread_id), "type": 11, "guild_id": str(GUILD_ID), "parent_id": str(parent_id),
+            "owner_id": str(BOT_ID), "name": payload.get("name", ""), "message_count": 1, "member_count": 1,
+            "rate_limit_per_user": 0, "flags": 0, "last_message_id": None,
+            "thread_metadata": {"archived": False, "auto_archive_duration": 1440,
+                                "archive_timestamp": _timestamp(), "locked": False},
+        }
+        self.channels[thread_id] = thread
+        message = payload.get("message") or {}
+        for embed in message.get("embeds") or []:
+            self.published[embed.get("url")] += 1
+        # Стартовое сообщение поста в форуме имеет тот же id, что и тред
+        thread["message"] = self._store_message(thread_id, message, message_id=thread_id)
+        return thread
+
+    def _archived_threads(self, params, payload, query):
+        # Все треды канала сразу, без страниц — в стенде их немного
+        parent = params["channel_id"]
+        threads = [t for t in self.channels.values() if t.get("parent_id") == parent and t.get("type") == 11]
+        return {"threads": threads, "members": [], "has_more": False}
+
+    def _get_channel(self, params, payload, query):
+        return self.channels[int(params["channel_id"])]
+
+    def _get_member(self, params, payload, query):
+        return self.member_json(int(params["user_id"]))
+
+
+class _FakeResponse:
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "Not Found"
+
+
+class HarnessSource(NewsSource):
+    """Источник с заранее заданными новостями вместо MAL"""
+
+    name = "harness"
+
+    def __init__(self, items: List[dict]):
+        super().__init__(interval_minutes=10, limit=len(items) or 1)
+        self.items = items
+
+    async def poll(self, limit=None, is_known=None) -> List[dict]:
+        return [dict(item, known=bool(is_known and is_known(item["id"]))) for item in self.items]
+
+
+def make_items(count: int, offset: int = 0) -> List[dict]:
+    items = []
+    for i in range(offset, offset + count):
+        link = f"https://myanimelist.net/news/{90000000 + i}"
+        items.append({
+            "id": link, "link": link, "title": f"『Harness {i}』", "image": None, "source": "harness",
+            "excerpt": f"Harness story number {i} with a unique body {i * 7919}.",
+            "original_title": f"'Harness {i}' unique headline {i * 104729}",
+            "original_excerpt": f"Harness story number {i} with a unique body {i * 7919} and words {i * 31}.",
+        })
+    return items
+
+
+class Harness:
+    def __init__(self, latency_ms: float = 0.0, rate_limits: bool = True, seed: int = 1, use_ha: bool = False):
+        self.fake = FakeDiscord(latency_ms=latency_ms, rate_limits=rate_limits)
+        self.random = random.Random(seed)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bot: Optional[commands.Bot] = None
+        self.cog = None
+        self.latencies: List[float] = []
+        self.events = 0
+        self.use_ha = use_ha
+        self.restarts = 0
+
+    async def start(self):
+        # Только серверы из storage — сервер из .env в стенде не участвует
+        config.MODERATION_CHANNEL_ID = 0
+        storage.__init__(Path(self.tmp.name) / "processed.json")
+        pending.__init__(Path(self.tmp.name) / "pending.sqlite3")
+        index.__init__()
+        self.reset_ha()
+        storage.set_guild_config(GuildConfig(
+            guild_id=GUILD_ID, moderation_channel_id=MODERATION_CHANNEL_ID, moderator_role_id=MODERATOR_ROLE_ID,
+            approved_channel_id=APPROVED_CHANNEL_ID, forum_channel_id=FORUM_CHANNEL_ID))
+
+        self.fake.add_channel(MODERATION_CHANNEL_ID, "moderation", 0)
+        self.fake.add_channel(FORUM_CHANNEL_ID, "news-forum", 15)
+        self.fake.add_channel(APPROVED_CHANNEL_ID, "approved", 0)
+
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_reactions = True
+        self.bot = commands.Bot(command_prefix="!", intents=intents, max_messages=None,
+                                member_cache_flags=discord.MemberCacheFlags.none())
+        await self.bot._async_setup_hook()
+        self.bot.http.request = self.fake.request
+        state = self.bot._connection
+        state.user = discord.ClientUser(state=state, data=_user(BOT_ID, bot=True))
+        self.guild = discord.Guild(data=self.fake.guild_json(), state=state)
+        state._add_guild(self.guild)
+        # Gateway нет — объявляем клиента готовым сами (wait_until_ready в сверке и циклах)
+        self.bot._ready.set()
+        await self.load_cog()
+        # Сверка при старте (каналы ещё пусты) — в отчёты сценариев не входит
+        await self.cog._reconcile()
+        self.fake.calls.clear()
+
+    async def load_cog(self):
+        from bot.cogs.moderation import Moderation
+        self.cog = Moderation(self.bot)
+        # циклы источников не нужны — тики вызываются сценарием напрямую
+        self.cog.cog_unload()
+
+    def reset_ha(self):
+        """HA выключен или включён с общей базой в tmp; экземпляр сразу ведущий, без цикла аренды"""
+        ha.__init__(enabled=self.use_ha, path=Path(self.tmp.name) / "ha.sqlite3",
+                    instance_id=f"harness-{self.restarts}")
+        ha._leader = True
+        ha._valid_until = float("inf")
+
+    async def restart(self):
+        """Имитация перезапуска: новый ког (пустой processing) и storage, перечитанный с диска"""
+        path = storage.path
+        storage.__init__(path)
+        index.__init__()
+        self.restarts += 1
+        self.reset_ha()
+        await self.load_cog()
+        await self.cog._reconcile()
+
+    async def stop(self):
+        await self.bot.close()
+        self.tmp.cleanup()
+
+    # --- действия ---
+
+    async def tick(self, items: List[dict]):
+        await self.cog.check_news(HarnessSource(items))
+
+    def moderation_messages(self) -> List[int]:
+        return sorted(self.fake.messages[MODERATION_CHANNEL_ID])
+
+    async def react(self, message_id: int, emoji: str, user_id: int):
+        """Реакция пользователя: меняем состояние фейка и вызываем raw-обработчик кога"""
+        self.fake.user_react(MODERATION_CHANNEL_ID, message_id, emoji, user_id)
+        data = {"user_id": str(user_id), "channel_id": str(MODERATION_CHANNEL_ID), "message_id": str(message_id),
+                "guild_id": str(GUILD_ID), "type": 0, "burst": False, "message_author_id": str(BOT_ID)}
+        payload = discord.RawReactionActionEvent(data, discord.PartialEmoji(name=emoji), "REACTION_ADD")
+        payload.member = discord.Member(data=self.fake.member_json(user_id), guild=self.guild,
+                                        state=self.bot._connection)
+        self.events += 1
+        started = time.perf_counter()
+        try:
+            await self.cog.on_raw_reaction_add(payload)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    def report(self, scenario: str, wall_s: float, **extra) -> dict:
+        total = sum(self.fake.calls.values())
+        duplicates = {url: n for url, n in self.fake.published.items() if n > 1}
+        return {
+            "scenario": scenario,
+            "revision": git_revision(),
+            "wall_s": round(wall_s, 3),
+            "events": self.events,
+            "rest_calls": total,
+            "rest_calls_per_event": round(total / self.events, 3) if self.events else None,
+            "rest_calls_by_route": dict(self.fake.calls.most_common()),
+            "rate_limited_by_route": dict(self.fake.rate_limited),
+            "rate_limit_wait_s": round(self.fake.rate_limit_wait_s, 3),
+            "unhandled_routes": dict(self.fake.unhandled),
+            "handler_latency_ms": {
+                "p50": round(percentile(self.latencies, 50) * 1000, 3),
+                "p99": round(percentile(self.latencies, 99) * 1000, 3),
+                "max": round(max(self.latencies, default=0) * 1000, 3),
+            },
+            "published": sum(self.fake.published.values()),
+            "duplicate_publishes": duplicates,
+            **extra,
+        }
+
+
+# --- сценарии ---
+
+async def news_burst(h: Harness, args) -> dict:
+    """Тик с N новыми новостями: сколько REST-вызовов стоит одна новость"""
+    started = time.perf_counter()
+    await h.tick(make_items(args.items))
+    h.events = args.items
+    return h.report("news_burst", time.perf_counter() - started)
+
+
+async def history_scan(h: Harness, args) -> dict:
+    """Повторный тик с уже известными новостями: цена поиска старых сообщений"""
+    items = make_items(args.items)
+    await h.tick(items)
+    h.fake.calls.clear()
+    started = time.perf_counter()
+    await h.tick(items)
+    h.events = args.items
+    return h.report("history_scan", time.perf_counter() - started)
+
+
+async def reaction_storm(h: Harness, args) -> dict:
+    """N реакций за S секунд по случайным сообщениям от модераторов и обычных пользователей"""
+    await h.tick(make_items(args.items))
+    messages = h.moderation_messages()
+    h.fake.calls.clear()
+    h.fake.rate_limited.clear()
+
+    interval = args.seconds / max(1, args.reactions)
+    started = time.perf_counter()
+    tasks = []
+    for i in range(args.reactions):
+        user = h.random.choice(MODERATORS) if h.random.random() < args.moderator_share else h.random.choice(USERS)
+        emoji = "✅" if h.random.random() < 0.7 else "❌"
+        tasks.append(asyncio.create_task(h.react(h.random.choice(messages), emoji, user)))
+        await asyncio.sleep(interval)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return h.report("reaction_storm", time.perf_counter() - started)
+
+
+async def concurrent_approvals(h: Harness, args) -> dict:
+    """Все модераторы одновременно жмут ✅ на каждом сообщении"""
+    await h.tick(make_items(args.items))
+    h.fake.calls.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        h.react(message_id, "✅", moderator)
+        for message_id in h.moderation_messages()
+        for moderator in MODERATORS[:args.moderators]
+    ), return_exceptions=True)
+    return h.report("concurrent_approvals", time.perf_counter() - started)
+
+
+async def restart_mid_publish(h: Harness, args) -> dict:
+    """Процесс «падает» после создания треда, но до 📌; после рестарта модератор жмёт ✅ ещё раз"""
+    await h.tick(make_items(1))
+    message_id = h.moderation_messages()[0]
+    h.fake.calls.clear()
+
+    def crash(route_key: str, params: dict):
+        if route_key.endswith("/reactions/{emoji}/@me") and params.get("emoji") == "📌":
+            return asyncio.CancelledError("simulated crash")
+        return None
+
+    started = time.perf_counter()
+    h.fake.fail_on = crash
+    try:
+        await h.react(message_id, "✅", MODERATORS[0])
+    except asyncio.CancelledError:
+        pass
+    h.fake.fail_on = None
+
+    await h.restart()
+    await h.react(message_id, "✅", MODERATORS[1])
+    return h.report("restart_mid_publish", time.perf_counter() - started)
+
+
+async def bulk_approve(h: Harness, args) -> dict:
+    """!approve all по очереди из N новостей: параллельная публикация без просмотра истории"""
+    await h.tick(make_items(args.items))
+    items = await pending.list_pending(GUILD_ID)
+    h.fake.calls.clear()
+    started = time.perf_counter()
+    published = await h.cog._bulk_publish(storage.get_guild_config(GUILD_ID), items)
+    h.events = len(items)
+    return h.report("bulk_approve", time.perf_counter() - started, published=published)
+
+
+async def approve_races(h: Harness, args) -> dict:
+    """Два !approve all одновременно и ✅ на каждом сообщении в это же время: ни одного дубля"""
+    await h.tick(make_items(args.items))
+    guild_cfg = storage.get_guild_config(GUILD_ID)
+    items = await pending.list_pending(GUILD_ID)
+    h.fake.calls.clear()
+    started = time.perf_counter()
+    await asyncio.gather(
+        h.cog._bulk_publish(guild_cfg, items),
+        h.cog._bulk_publish(guild_cfg, items),
+        *(h.react(message_id, "✅", MODERATORS[0]) for message_id in h.moderation_messages()),
+    )
+    h.events = len(items)
+    return h.report("approve_races", time.perf_counter() - started)
+
+
+async def startup_reconcile(h: Harness, args) -> dict:
+    """Рестарт после тика и одобрений: цена сверки с каналами, затем повторный тик без чтения истории"""
+    items = make_items(args.items)
+    await h.tick(items)
+    for message_id in h.moderation_messages()[::2]:
+        await h.react(message_id, "✅", MODERATORS[0])
+    h.fake.calls.clear()
+    started = time.perf_counter()
+    await h.restart()
+    reconcile_calls = sum(h.fake.calls.values())
+    await h.tick(items)
+    h.events = args.items
+    return h.report("startup_reconcile", time.perf_counter() - started, reconcile_calls=reconcile_calls,
+                    indexed=len(index), pending=await pending.count_pending(GUILD_ID))
+
+
+async def offline_decisions(h: Harness, args) -> dict:
+    """Реакции, поставленные, пока бот лежал: после рестарта ✅ модератора публикуется, ❌ — снимается с очереди"""
+    await h.tick(make_items(args.items))
+    messages = h.moderation_messages()
+    third = len(messages) // 3
+    for i, message_id in enumerate(messages):
+        # Без вызова обработчика — gateway этих событий боту не доставил
+        emoji, user = ("✅", MODERATORS[0]) if i < third else ("❌", MODERATORS[1]) if i < 2 * third else ("✅", USERS[0])
+        h.fake.user_react(MODERATION_CHANNEL_ID, message_id, emoji, user)
+    h.fake.calls.clear()
+    started = time.perf_counter()
+    await h.restart()
+    h.events = len(messages)
+    return h.report("offline_decisions", time.perf_counter() - started, pending=await pending.count_pending(GUILD_ID))
+
+
+SCENARIOS = {
+    "news_burst": news_burst,
+    "history_scan": history_scan,
+    "reaction_storm": reaction_storm,
+    "concurrent_approvals": concurrent_approvals,
+    "restart_mid_publish": restart_mid_publish,
+    "bulk_approve": bulk_approve,
+    "startup_reconcile": startup_reconcile,
+    "approve_races": approve_races,
+    "offline_decisions": offline_decisions,
+}
+
+
+async def run(args) -> List[dict]:
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = []
+    for name in names:
+        h = Harness(latency_ms=args.latency_ms, rate_limits=not args.no_rate_limits, seed=args.seed, use_ha=args.ha)
+        await h.start()
+        try:
+            results.append(await SCENARIOS[name](h, args))
+        finally:
+            await h.stop()
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenario", choices=["all", *SCENARIOS], default="all")
+    ap.add_argument("--items", type=int, default=6, help="новостей в тике")
+    ap.add_argument("--reactions", type=int, default=500)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--moderator-share", type=float, default=0.3)
+    ap.add_argument("--moderators", type=int, default=3)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="задержка каждого REST-вызова")
+    ap.add_argument("--no-rate-limits", action="store_true")
+    ap.add_argument("--ha", action="store_true", help="общие блокировки публикаций (HA_ENABLED)")
+    ap.add_argument("--digest", action="store_true", help="новости тика одним сообщением (DIGEST_MODE)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--output", help="куда записать JSON с результатами")
+    args = ap.parse_args(argv)
+    config.DIGEST_MODE = args.digest
+
+    results = asyncio.run(run(args))
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
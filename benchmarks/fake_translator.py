@@ -0,0 +1,16 @@
+import time
+
+
+class FakeTranslator:
+    """Замена Google Translator: блокирующая задержка как у настоящего HTTP-вызова"""
+
+    def __init__(self, delay_ms: float = 0.0):
+        self.delay_ms = delay_ms
+        self.calls = 0
+
+    def __call__(self, text: str) -> str:
+        self.calls += 1
+        if self.delay_ms > 0:
+            # time.sleep, а не asyncio.sleep: настоящий переводчик тоже блокирует event loop
+            time.sleep(self.delay_ms / 1000)
+        return f"[ru] {text}"
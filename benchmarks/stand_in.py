@@ -0,0 +1,117 @@
+"""Локальная замена myanimelist.net для бенчмарков.
+
+Отдаёт архивные страницы из benchmarks/fixtures с настраиваемой задержкой
+и долей отказов (503), чтобы гонять парсер без сети. Картинки CDN (/cdn/...)
+отвечают одним и тем же крошечным JPEG — резолверу картинок хватает заголовков.
+"""
+import asyncio
+import random
+from pathlib import Path
+from typing import Optional
+
+from aiohttp import web
+
+FIXTURES = Path(__file__).parent / "fixtures"
+# SOI + EOI: Content-Type важнее содержимого
+TINY_JPEG = b"\xff\xd8\xff\xd9"
+
+
+class StandInServer:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, failure_rate: float = 0.0,
+                 seed: Optional[int] = None, host: str = "127.0.0.1", port: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.host = host
+        self.port = port
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._fixtures = {name: (FIXTURES / name).read_text(encoding="utf-8")
+                          for name in ("listing.html", "article.html", "news.xml")}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def render(self, name: str, **extra) -> str:
+        text = self._fixtures[name].replace("{base}", self.base_url)
+        for key, value in extra.items():
+            text = text.replace("{" + key + "}", value)
+        return text
+
+    @web.middleware
+    async def _inject(self, request: web.Request, handler):
+        self.requests += 1
+        delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            self.failures += 1
+            return web.Response(status=503, text="injected failure")
+        return await handler(request)
+
+    async def _listing(self, request: web.Request):
+        return web.Response(text=self.render("listing.html"), content_type="text/html")
+
+    async def _rss(self, request: web.Request):
+        return web.Response(text=self.render("news.xml"), content_type="application/rss+xml")
+
+    async def _article(self, request: web.Request):
+        title = f"News {request.match_info['news_id']}"
+        return web.Response(text=self.render("article.html", title=title), content_type="text/html")
+
+    async def _image(self, request: web.Request):
+        return web.Response(body=TINY_JPEG, content_type="image/jpeg")
+
+    async def start(self):
+        app = web.Application(middlewares=[self._inject])
+        app.router.add_get("/news", self._listing)
+        app.router.add_get("/rss/news.xml", self._rss)
+        app.router.add_get("/news/{news_id}", self._article)
+        app.router.add_get("/cdn/{path:.+}", self._image)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # порт 0 — берём реально выданный системой
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+async def _serve_forever(args):
+    server = StandInServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                           failure_rate=args.failure_rate, seed=args.seed, host=args.host, port=args.port)
+    await server.start()
+    print(f"stand-in listening on {server.base_url}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local MyAnimeList stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    try:
+        asyncio.run(_serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,50 @@
+import statistics
+import subprocess
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(latencies: List[float], wall_s: float, cpu_s: float, peak_mem_kb: float) -> Dict[str, float]:
+    """Сводка по стадии: пропускная способность, p50/p99 (мс), CPU и пиковая память"""
+    count = len(latencies)
+    return {
+        "count": count,
+        "throughput_per_s": round(count / wall_s, 3) if wall_s > 0 else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "cpu_s": round(cpu_s, 4),
+        "peak_mem_kb": round(peak_mem_kb, 1),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: Dict, baseline: Dict, keys=("p50_ms", "p99_ms", "cpu_s", "peak_mem_kb")) -> List[str]:
+    """Строки сравнения двух результатов (baseline → current) по общим стадиям"""
+    lines = []
+    for stage, cur in current.get("stages", {}).items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        parts = []
+        for key in keys:
+            old, new = base.get(key, 0), cur.get(key, 0)
+            delta = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            parts.append(f"{key} {old} → {new} ({delta})")
+        lines.append(f"{stage}: " + ", ".join(parts))
+    return lines
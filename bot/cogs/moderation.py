@@ -1,21 +1,114 @@
 from discord.ext import commands, tasks
 import discord
 import asyncio
-from bot.config import config
+import io
+import logging
+import re
+import time
+from collections import deque
+from datetime import datetime
+from typing import List, Optional, Set
+from bot.config import config, GuildConfig
 from bot.parser import parse_latest_news
 from bot.storage import storage
+from bot import digest
+from bot.dedup import fingerprint
+from bot.governor import all_governors
+from bot.ha import StandbyError, ha
+from bot.images import resolver
+from bot.log import correlation, new_tick_id
+from bot.pending import APPROVED, REJECTED, pending
+from bot.reconcile import IndexedMessage, index, scan_moderation, scan_published
+from bot.metrics import NEWS_ITEMS, REACTION_HANDLER_SECONDS, REST_REQUESTS, STAGE_ERRORS, STAGE_SECONDS, cache_hit_ratio, timed
+from bot.sources import NewsSource, build_sources
+from bot.watchdog import watchdog
+
+log = logging.getLogger(__name__)
 
 class Moderation(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.check_news.start()
         # Множество message.id, которые сейчас обрабатываются (предотвращает дубли при одновременных реакциях)
         self.processing = set()
+        # Ключи публикаций (storage.published_key), которые сейчас публикуются этим процессом:
+        # реакция, !approve и дайджест не опубликуют одну новость дважды, даже при выключенном HA
+        self.publishing = set()
+        # Ограничение параллельной рассылки по серверам
+        self.fanout_semaphore = asyncio.Semaphore(config.FANOUT_CONCURRENCY)
+        # Реакции, пришедшие, пока экземпляр резервный: (monotonic, payload)
+        self.standby_reactions = deque(maxlen=500)
+        # Сверка с каналами при старте — одна на все циклы источников
+        self._reconcile_task: Optional[asyncio.Task] = None
+        # Фоновые задачи команд: event loop держит на задачи только слабые ссылки
+        self._background_tasks: Set[asyncio.Task] = set()
+        ha.on_promote.append(self._on_promote)
+        ha.on_renew.append(self._replay_standby)
+        # Каждый источник опрашивается своим циклом со своим интервалом — медленный источник не тормозит остальные
+        self.sources = build_sources()
+        self.source_loops = {source.name: self._make_source_loop(source) for source in self.sources}
+        for loop in self.source_loops.values():
+            loop.start()
 
     def cog_unload(self):
-        self.check_news.cancel()
+        for loop in self.source_loops.values():
+            loop.cancel()
+        if self._on_promote in ha.on_promote:
+            ha.on_promote.remove(self._on_promote)
+        if self._replay_standby in ha.on_renew:
+            ha.on_renew.remove(self._replay_standby)
+
+    async def cog_check(self, ctx):
+        # Команды выполняет только ведущий экземпляр, иначе ответ пришёл бы дважды
+        if not ha.is_leader:
+            raise StandbyError()
+        return True
+
+    async def cog_command_error(self, ctx, error):
+        if isinstance(error, StandbyError):
+            return
+        log.error("Ignoring exception in command %s", ctx.command, exc_info=error)
+
+    async def _on_promote(self):
+        """Экземпляр стал ведущим: состояние предыдущего с диска, сразу опрос источников и реакции, пришедшие в резерве"""
+        await asyncio.to_thread(storage.reload)
+        await ha.prune()
+        # Пока экземпляр был резервным, сообщения отправлял другой — сверяемся заново.
+        # Сверка пишет в storage, поэтому её делает только ведущий
+        self._start_reconcile()
+        for loop in self.source_loops.values():
+            loop.restart()
+        await self._replay_standby()
 
-    @commands.command(name="lastnews")
+    async def _replay_standby(self):
+        """Реакции, отложенные, пока экземпляр не был ведущим: в резерве или при запоздавшем продлении аренды.
+
+        Вызывается при переходе в ведущие и при каждом продлении аренды. Реакция, пришедшая, пока
+        аренда снова не подтверждена, опять откладывается и разбирается следующим вызовом.
+        """
+        if not ha.is_leader or not self.standby_reactions:
+            return
+        # Старые реакции обработал прежний ведущий, пока держал аренду
+        horizon = time.monotonic() - config.HA_LEASE_SECONDS - 2 * config.HA_RENEW_SECONDS
+        pending = [payload for at, payload in self.standby_reactions if at >= horizon]
+        self.standby_reactions.clear()
+        if pending:
+            log.info("HA: обрабатываю %d отложенных реакций.", len(pending))
+        for payload in pending:
+            await self.on_raw_reaction_add(payload)
+
+    def _make_source_loop(self, source: NewsSource) -> tasks.Loop:
+        async def tick():
+            # Источники опрашивает только ведущий экземпляр
+            if not ha.is_leader:
+                return
+            with correlation(tick=new_tick_id(source.name)):
+                await self.check_news(source)
+
+        loop = tasks.loop(minutes=source.interval_minutes)(tick)
+        loop.before_loop(self.before_check)
+        return loop
+
+    @commands.hybrid_command(name="lastnews")
     async def last_news(self, ctx):
         """Отправляет последнюю новость с MyAnimeList"""
         await ctx.send("🔍 Загружаю последнюю новость, подожди немного...")
@@ -42,13 +135,14 @@ class Moderation(commands.Cog):
 
             # Отправляем embed и пытаемся добавить реакции так же, как в check_news
             try:
-                msg = await ctx.send(embed=embed)
+                msg = await ctx.send(embed=embed, files=resolver.attachments([embed]))
             except Exception as e:
                 await ctx.send(f"Ошибка при отправке новости: {e}")
-                print("lastnews: Error sending embed:", e)
+                log.warning("lastnews: error sending embed: %s", e)
                 return
 
-            print(f"lastnews: sent msg type={type(msg)} id={getattr(msg,'id',None)} author={getattr(msg,'author',None)} webhook_id={getattr(msg,'webhook_id',None)}")
+            log.debug("lastnews: sent msg type=%s id=%s author=%s webhook_id=%s",
+                      type(msg), getattr(msg, 'id', None), getattr(msg, 'author', None), getattr(msg, 'webhook_id', None))
 
             # Если объект не поддерживает add_reaction — попробуем получить реальное Message
             if not hasattr(msg, "add_reaction") or not callable(getattr(msg, "add_reaction", None)):
@@ -56,139 +150,333 @@ class Moderation(commands.Cog):
                     fetched = await ctx.channel.fetch_message(getattr(msg, "id", None))
                     if fetched:
                         msg = fetched
-                        print(f"lastnews: fetched message id={msg.id} type={type(msg)}")
+                        log.debug("lastnews: fetched message id=%s type=%s", msg.id, type(msg))
                 except Exception as e:
-                    print("lastnews: fetch failed:", e)
+                    log.warning("lastnews: fetch failed: %s", e)
 
             # Добавляем реакции с обработкой ошибок
             try:
                 for emoji in ("✅", "❌"):
                     await msg.add_reaction(emoji)
-                    print(f"lastnews: added reaction {emoji} to id={getattr(msg,'id',None)}")
+                    log.debug("lastnews: added reaction %s to id=%s", emoji, getattr(msg, 'id', None))
                     await asyncio.sleep(0.25)
             except discord.Forbidden:
-                print("lastnews: No permission to add reactions.")
+                log.warning("lastnews: no permission to add reactions.")
             except Exception as e:
-                print("lastnews: Error adding reaction:", e)
+                log.warning("lastnews: error adding reaction: %s", e)
 
         except Exception as e:
             await ctx.send(f"⚠️ Ошибка при получении новости: {e}")
-            print("Error in lastnews command:", e)
+            log.exception("Error in lastnews command: %s", e)
 
-    @tasks.loop(minutes=config.CHECK_INTERVAL_MINUTES)
-    async def check_news(self):
-        channel = self.bot.get_channel(config.MODERATION_CHANNEL_ID)
-        if not channel:
-            print("Канал модерации не найден (check_news).")
+    def _guild_configs(self) -> List[GuildConfig]:
+        """Все подписанные серверы: из storage плюс сервер из .env (старый односерверный режим)"""
+        guilds = storage.guild_configs()
+        default = config.default_guild()
+        if default and all(g.moderation_channel_id != default.moderation_channel_id for g in guilds):
+            guilds.append(default)
+        return guilds
+
+    def _guild_config_for(self, guild: Optional[discord.Guild]) -> Optional[GuildConfig]:
+        """Настройки сервера, где вызвана команда (учитывает и сервер из .env)"""
+        if guild is None:
+            return None
+        for guild_cfg in self._guild_configs():
+            if guild_cfg.guild_id == guild.id:
+                return guild_cfg
+            channel = self.bot.get_channel(guild_cfg.moderation_channel_id)
+            if guild_cfg.guild_id == 0 and channel is not None and channel.guild.id == guild.id:
+                return guild_cfg
+        return None
+
+    def _is_moderator(self, member) -> bool:
+        guild_cfg = self._guild_config_for(getattr(member, "guild", None))
+        if guild_cfg is None:
+            return False
+        return any(r.id == guild_cfg.moderator_role_id for r in getattr(member, "roles", []))
+
+    def _guild_for_moderation_channel(self, channel_id: int) -> Optional[GuildConfig]:
+        for guild_cfg in self._guild_configs():
+            if guild_cfg.moderation_channel_id == channel_id:
+                return guild_cfg
+        return None
+
+    async def _fan_out(self, guilds: List[GuildConfig], handler, *args):
+        """Запускает handler(guild_cfg, *args) для всех серверов параллельно, но не больше FANOUT_CONCURRENCY сразу"""
+        async def run(guild_cfg: GuildConfig):
+            async with self.fanout_semaphore:
+                try:
+                    await handler(guild_cfg, *args)
+                except Exception as e:
+                    log.exception("Ошибка при рассылке на сервер %s: %s", guild_cfg.guild_id, e)
+
+        await asyncio.gather(*(run(g) for g in guilds))
+
+    async def check_news(self, source: NewsSource):
+        """Один проход по источнику: новые записи уходят в каналы модерации всех подписанных серверов"""
+        guilds = self._guild_configs()
+        if not guilds:
+            log.warning("Нет ни одного сервера с каналом модерации (check_news).")
             return
         try:
-            news_list = await parse_latest_news(limit=config.NEWS_LIMIT)
+            # Для уже известных id парсер не качает статью и не переводит текст
+            news_list = await source.poll(is_known=storage.seen)
         except Exception as e:
-            print("Error fetching news:", e)
+            log.warning("Error fetching news from %s: %s", source.name, e)
             return
 
-        # Получаем bot_member и права заранее
-        bot_member = None
-        if channel.guild:
-            bot_member = channel.guild.get_member(self.bot.user.id) or channel.guild.me
-            if not bot_member:
-                try:
-                    bot_member = await channel.guild.fetch_member(self.bot.user.id)
-                except Exception:
-                    bot_member = channel.guild.me
-        perms = channel.permissions_for(bot_member) if bot_member else None
-        print(f"Bot member: {bot_member} perms: {perms}")
-
+        digest_embeds = []
         for item in news_list:
-            if storage.seen(item["id"]):
-                # Попробуем найти уже отправленное сообщение и добавить недостающие реакции
-                try:
-                    found = None
-                    async for m in channel.history(limit=200):
-                        if m.embeds and m.embeds[0].title == item["title"]:
-                            found = m
-                            break
-                    if found:
-                        existing = [str(r.emoji) for r in found.reactions]
-                        to_add = [e for e in ("✅", "❌") if e not in existing]
-                        if to_add:
-                            print(f"Найдена старая новость (id={item['id']}) — добавляю недостающие реакции: {to_add}")
-                            for emoji in to_add:
-                                try:
-                                    await found.add_reaction(emoji)
-                                    print(f"Восстановлена реакция {emoji} для сообщения id={found.id}")
-                                    await asyncio.sleep(0.25)
-                                except Exception as e:
-                                    print("Ошибка при восстановлении реакции:", e)
-                        else:
-                            print(f"Найдена старая новость (id={item['id']}) — реакции уже присутствуют.")
-                        continue
-                except Exception as e:
-                    print("Ошибка при поиске/восстановлении старого сообщения:", e)
-                    # продолжаем; если не найдена — не отправлять повторно
-                    continue
+            with correlation(news=item["id"]):
+                embed = await self._process_item(source, guilds, item)
+            if embed is None:
+                continue
+            if config.DIGEST_MODE:
+                digest_embeds.append(embed)
+            else:
+                with correlation(news=item["id"]):
+                    # Один парсинг и перевод на все серверы: рассылаем готовый embed параллельно
+                    await self._fan_out(guilds, self._send_to_moderation, embed)
+
+        # В режиме дайджеста — одно сообщение на каждые 10 новостей вместо сообщения и двух реакций на каждую
+        for start in range(0, len(digest_embeds), digest.DIGEST_MAX_ITEMS):
+            await self._fan_out(guilds, self._send_digest, digest_embeds[start:start + digest.DIGEST_MAX_ITEMS])
+
+    async def _process_item(self, source: NewsSource, guilds: List[GuildConfig], item: dict) -> Optional[discord.Embed]:
+        """Новая новость → embed для модерации; известная или дубль → None"""
+        if storage.seen(item["id"]):
+            # Попробуем найти уже отправленное сообщение и добавить недостающие реакции.
+            # Повторно известную новость не отправляем, даже если сообщение не найдено.
+            # В дайджестах реакций нет — восстанавливать нечего.
+            if not config.DIGEST_MODE:
+                await self._fan_out(guilds, self._restore_reactions, item)
+            return None
+        # Тот же сюжет под другой ссылкой или из другого источника — не отправляем повторно
+        fp = fingerprint(item)
+        duplicate_of = storage.find_duplicate(fp, exclude=item["id"])
+        if duplicate_of:
+            log.info("Новость id=%s — дубль уже отправленной %s, пропускаю.", item['id'], duplicate_of)
+            NEWS_ITEMS.inc(source=source.name, outcome="duplicate")
             storage.add(item["id"])
-            embed = discord.Embed(
-                title=item["title"],
-                url=item.get("link"),
-                description=item["excerpt"][:300] + "...",
-                color=discord.Color.blurple()
-            )
-            # (footer убран по просьбе) URL новости добавлен в embed.url
+            return None
+        # seen(), find_duplicate() и add() идут без await между ними, поэтому циклы разных
+        # источников не могут одновременно отправить одну и ту же новость
+        storage.add(item["id"], fingerprint=fp)
+        NEWS_ITEMS.inc(source=source.name, outcome="sent")
+        embed = discord.Embed(
+            title=item["title"],
+            url=item.get("link"),
+            description=item["excerpt"][:300] + "...",
+            color=discord.Color.blurple()
+        )
+        # (footer убран по просьбе) URL новости добавлен в embed.url
 
-            # Встраиваем картинку в embed, если есть
-            if item.get("image"):
-                try:
-                    embed.set_image(url=item["image"])
-                except Exception as e:
-                    print("Error setting embed image:", e)
+        # Встраиваем картинку в embed, если есть
+        if item.get("image"):
+            try:
+                embed.set_image(url=item["image"])
+            except Exception as e:
+                log.warning("Error setting embed image: %s", e)
 
-            # не отправляем картинку отдельно — она уже в embed
+        # не отправляем картинку отдельно — она уже в embed
+        return embed
 
+    async def _restore_reactions(self, guild_cfg: GuildConfig, item: dict):
+        """Добавляет недостающие ✅/❌ к уже отправленной новости — по индексу, без чтения истории канала"""
+        # Сравниваем по ссылке: заголовок у известных новостей не переводится
+        entry = index.find(guild_cfg.guild_id, item["link"])
+        if entry is None:
+            return
+        to_add = [e for e in ("✅", "❌") if e not in entry.reactions]
+        if not to_add:
+            return
+        log.info("Найдена старая новость (id=%s) — добавляю недостающие реакции: %s", item['id'], to_add)
+        message = self.bot.get_partial_messageable(entry.channel_id).get_partial_message(entry.message_id)
+        for emoji in to_add:
             try:
-                msg = await channel.send(embed=embed)
+                await timed("discord_react", message.add_reaction(emoji))
+                index.reacted(entry.message_id, emoji, mine=True)
+                log.debug("Восстановлена реакция %s для сообщения id=%s", emoji, entry.message_id)
+                await asyncio.sleep(0.25)
             except Exception as e:
-                print("Error sending embed:", e)
-                continue
+                log.warning("Ошибка при восстановлении реакции: %s", e)
 
-            print(f"Отправлено сообщение типа {type(msg)} id={getattr(msg, 'id', None)} author={getattr(msg, 'author', None)} webhook_id={getattr(msg, 'webhook_id', None)}")
+    async def _send_to_moderation(self, guild_cfg: GuildConfig, embed: discord.Embed):
+        channel = self.bot.get_channel(guild_cfg.moderation_channel_id)
+        if not channel:
+            log.warning("Канал модерации сервера %s не найден.", guild_cfg.guild_id)
+            return
 
-            # Если объект не поддерживает add_reaction — попробуем получить реальное Message
-            if not hasattr(msg, "add_reaction") or not callable(getattr(msg, "add_reaction", None)):
-                try:
-                    fetched = await channel.fetch_message(getattr(msg, "id", None))
-                    if fetched:
-                        msg = fetched
-                        print(f"Получено сообщение через fetch_message: id={msg.id} author={getattr(msg, 'author', None)} webhook_id={getattr(msg, 'webhook_id', None)}")
-                except Exception as e:
-                    print("Не удалось получить сообщение через fetch_message:", e)
+        try:
+            msg = await timed("discord_send", channel.send(embed=embed, files=resolver.attachments([embed])))
+        except Exception as e:
+            log.warning("Error sending embed: %s", e)
+            return
+
+        log.info("Отправлено сообщение id=%s в канал %s (сервер %s)", getattr(msg, 'id', None), channel.id, guild_cfg.guild_id)
+        await self._enqueue(guild_cfg, channel.id, msg.id, embed)
+        self._index_message(guild_cfg, msg)
 
-            # Проверяем ещё раз права перед добавлением реакций
+        # Если объект не поддерживает add_reaction — попробуем получить реальное Message
+        if not hasattr(msg, "add_reaction") or not callable(getattr(msg, "add_reaction", None)):
             try:
-                bot_member = channel.guild.get_member(self.bot.user.id) or channel.guild.me
-                perms = channel.permissions_for(bot_member) if bot_member else None
-                print(f"Права перед add_reaction: {perms}")
+                fetched = await channel.fetch_message(getattr(msg, "id", None))
+                if fetched:
+                    msg = fetched
+                    log.debug("Получено сообщение через fetch_message: id=%s author=%s webhook_id=%s",
+                              msg.id, getattr(msg, 'author', None), getattr(msg, 'webhook_id', None))
             except Exception as e:
-                print("Не удалось определить права перед add_reaction:", e)
+                log.warning("Не удалось получить сообщение через fetch_message: %s", e)
 
-            # Добавляем реакции с обработкой ошибок и паузой
-            for emoji in ("✅", "❌"):
-                try:
-                    if perms and not perms.add_reactions:
-                        print("У бота нет права add_reactions — пропускаю добавление реакций.")
-                        break
-                    await msg.add_reaction(emoji)
-                    print(f"Добавлена реакция {emoji} для сообщения id={getattr(msg, 'id', None)}")
-                    await asyncio.sleep(0.25)
-                except discord.Forbidden:
-                    print("Нет прав добавлять реакции в этом канале.")
+        # Проверяем права перед добавлением реакций
+        perms = None
+        try:
+            bot_member = channel.guild.get_member(self.bot.user.id) or channel.guild.me
+            perms = channel.permissions_for(bot_member) if bot_member else None
+        except Exception as e:
+            log.warning("Не удалось определить права перед add_reaction: %s", e)
+
+        # Добавляем реакции с обработкой ошибок и паузой
+        for emoji in ("✅", "❌"):
+            try:
+                if perms and not perms.add_reactions:
+                    log.warning("У бота нет права add_reactions — пропускаю добавление реакций.")
                     break
-                except Exception as e:
-                    print("Ошибка при добавлении реакции:", e)
+                await timed("discord_react", msg.add_reaction(emoji))
+                index.reacted(msg.id, emoji, mine=True)
+                log.debug("Добавлена реакция %s для сообщения id=%s", emoji, getattr(msg, 'id', None))
+                await asyncio.sleep(0.25)
+            except discord.Forbidden:
+                log.warning("Нет прав добавлять реакции в этом канале.")
+                break
+            except Exception as e:
+                log.warning("Ошибка при добавлении реакции: %s", e)
 
-    @check_news.before_loop
     async def before_check(self):
         await self.bot.wait_until_ready()
+        # Первый тик — после сверки: восстановлению реакций и проверке дублей нужен индекс.
+        # Резервный экземпляр не сверяется (она пишет в storage) — это сделает _on_promote
+        if self._reconcile_task is None and ha.is_leader:
+            self._start_reconcile()
+        if self._reconcile_task is not None:
+            # shield: отмена одного цикла не должна прерывать общую для всех сверку
+            await asyncio.shield(self._reconcile_task)
+
+    def _start_reconcile(self):
+        """Запускает (или перезапускает) общую сверку с каналами"""
+        if self._reconcile_task is not None and not self._reconcile_task.done():
+            self._reconcile_task.cancel()
+        self._reconcile_task = asyncio.create_task(self._reconcile())
+
+    # --- сверка с каналами ---
+
+    def _index_message(self, guild_cfg: GuildConfig, message: discord.Message):
+        index.add(IndexedMessage.from_message(guild_cfg.guild_id, message))
+
+    async def _reconcile(self):
+        """Один проход по каналам всех серверов при старте вместо чтения истории на каждом тике и реакции"""
+        await self.bot.wait_until_ready()
+        started = time.perf_counter()
+        guilds = self._guild_configs()
+        await self._fan_out(guilds, self._reconcile_guild)
+        log.info("Сверка каналов: %d серверов, %d сообщений модерации в индексе за %.1f с",
+                 len(guilds), len(index), time.perf_counter() - started)
+
+    async def _reconcile_guild(self, guild_cfg: GuildConfig):
+        """Индекс сообщений модерации сервера, отметки опубликованного и очередь — по истории каналов"""
+        channel = self.bot.get_channel(guild_cfg.moderation_channel_id)
+        if channel is None:
+            log.warning("Сверка: канал модерации сервера %s не найден.", guild_cfg.guild_id)
+            return
+        limit = config.RECONCILE_HISTORY_LIMIT
+        entries = await scan_moderation(channel, self.bot.user.id, guild_cfg.guild_id, limit)
+        target = await self._publish_target(guild_cfg)
+        since = entries[0].created_at if entries else None
+        published = await scan_published(target, limit, since) if target else set()
+        # 📌 ставится только после публикации этим ботом — реакцией публикуется первый embed сообщения
+        published.update(e.news_ids[0] for e in entries if e.pinned and e.news_ids)
+
+        index.reset(guild_cfg.guild_id)
+        for entry in entries:
+            index.add(entry)
+        # Новости из канала модерации уже отправлены — даже если processed.json потерян
+        added = storage.merge(seen=[nid for e in entries for nid in e.news_ids],
+                              published=published, guild_id=guild_cfg.guild_id)
+        await self._reconcile_queue(guild_cfg, entries)
+        index.mark_ready(guild_cfg.guild_id)
+        # Реакции, поставленные, пока бот был выключен, gateway уже не пришлёт — применяем их сами
+        decided = await self._replay_decisions(guild_cfg, channel, entries)
+        queued = await pending.count_pending(guild_cfg.guild_id)
+        log.info("Сверка сервера %s: %d сообщений модерации, %d опубликованных, новых отметок %d, "
+                 "решений по реакциям %d, в очереди %d",
+                 guild_cfg.guild_id, len(entries), len(published), added, decided, queued)
+
+    @staticmethod
+    async def _reconcile_queue(guild_cfg: GuildConfig, entries: List[IndexedMessage]):
+        """Очередь по каналу модерации: сообщения, отправленные до неё, с решениями, видными по самим
+        сообщениям (📌 и отметки дайджеста). Реакции без 📌 разбирает _replay_decisions."""
+        for entry in entries:
+            for emb in entry.to_embeds():
+                if not emb.url:
+                    continue
+                state = digest.item_state(emb)
+                # Одобрение засчитываем только опубликованным (как _record_decision)
+                if storage.published(emb.url, guild_cfg.guild_id):
+                    state = APPROVED
+                elif state == APPROVED:
+                    state = digest.PENDING
+                await pending.add(guild_cfg.guild_id, emb.url, emb.title or '', entry.channel_id, entry.message_id,
+                                  digest.clean(emb).to_dict() if emb.footer.text else emb.to_dict(),
+                                  created_at=entry.created_at.timestamp())
+                if state != digest.PENDING:
+                    await pending.decide_news(guild_cfg.guild_id, emb.url, state, "reconcile")
+
+    async def _replay_decisions(self, guild_cfg: GuildConfig, channel, entries: List[IndexedMessage]) -> int:
+        """✅/❌ модератора на сообщениях без 📌: одобрение публикуется, отклонение записывается в очередь.
+
+        Кто поставил реакцию, индекс не знает — такие сообщения (обычно единицы) читаются из API.
+        Новости, по которым очередь уже знает решение, не читаются. Возвращает число применённых решений.
+        """
+        candidates = [e for e in entries if not e.pinned and e.news_ids and e.others & {"✅", "❌"}]
+        if not candidates:
+            return 0
+        undecided = await pending.undecided(guild_cfg.guild_id, [e.news_ids[0] for e in candidates])
+        # Не get_guild(guild_cfg.guild_id): у сервера из .env guild_id = 0
+        guild = channel.guild
+        decided = 0
+        for entry in candidates:
+            emb = entry.to_embeds()[0]
+            # В дайджесте решения принимаются кнопками, а не реакциями
+            if emb.url not in undecided or digest.is_digest([emb]) or storage.published(emb.url, guild_cfg.guild_id):
+                continue
+            try:
+                message = await channel.fetch_message(entry.message_id)
+            except discord.HTTPException as e:
+                log.warning("Сверка: не удалось прочитать сообщение id=%s: %s", entry.message_id, e)
+                continue
+            voters = {}
+            for reaction in message.reactions:
+                emoji = str(reaction.emoji)
+                # Реакции только бота (✅/❌ он ставит сам) читать незачем
+                if emoji not in ("✅", "❌") or reaction.count <= (1 if reaction.me else 0):
+                    continue
+                async for user in reaction.users():
+                    if user.bot:
+                        continue
+                    member = await self._find_moderator(guild_cfg, guild, user.id)
+                    if member is not None:
+                        voters[emoji] = member
+                        break
+            # Как и вживую, ✅ публикует, даже если кто-то успел поставить ❌
+            if "✅" in voters:
+                with correlation(news=emb.url):
+                    await self._approve_message(guild_cfg, message, emb, voters["✅"])
+            elif "❌" in voters:
+                await self._record_decision(guild_cfg, emb.url, REJECTED, voters["❌"])
+            else:
+                continue
+            decided += 1
+        return decided
 
     @commands.Cog.listener()
     async def on_reaction_add(self, reaction: discord.Reaction, user: discord.User):
@@ -197,215 +485,647 @@ class Moderation(commands.Cog):
         if user.bot:
             return
         # Дополнительный лог для отладки
-        try:
-            print(f"on_reaction_add (ignored) reaction={reaction.emoji} user={user} message_id={getattr(reaction.message,'id',None)}")
-        except Exception:
-            pass
-        return
+        log.debug("on_reaction_add (ignored) reaction=%s user=%s message_id=%s",
+                  reaction.emoji, user, getattr(reaction.message, 'id', None))
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        # Индекс знает обо всех реакциях (и своих тоже) — так проверка 📌 и восстановление обходятся без запросов
+        index.reacted(payload.message_id, str(payload.emoji), mine=payload.user_id == self.bot.user.id)
+        if not ha.is_leader:
+            # Резервный экземпляр только запоминает реакции: после перехода в ведущие они не потеряются
+            if payload.user_id != self.bot.user.id:
+                self.standby_reactions.append((time.monotonic(), payload))
+            return
+        with REACTION_HANDLER_SECONDS.time(), correlation(tick=new_tick_id("reaction")):
+            await self._handle_raw_reaction(payload)
+
+    async def _handle_raw_reaction(self, payload: discord.RawReactionActionEvent):
         # Обработка реакций, когда сообщение может отсутствовать в кеше
         if payload.user_id == self.bot.user.id:
             return
-        if payload.channel_id != config.MODERATION_CHANNEL_ID:
+        guild_cfg = self._guild_for_moderation_channel(payload.channel_id)
+        if guild_cfg is None:
+            return
+        # Участник приходит вместе с событием — отсекаем не-модераторов до любых запросов к API
+        if payload.member is not None and not any(r.id == guild_cfg.moderator_role_id for r in payload.member.roles):
+            return
+
+        # Сообщение из индекса: embed и реакции известны, читать его из API не нужно
+        entry = index.message(payload.message_id)
+        if entry is None:
+            entry = await self._fetch_indexed(guild_cfg, payload)
+            if entry is None:
+                return
+
+        # Если исходное сообщение уже помечено (📌), значит оно уже обработано — пропускаем
+        if entry.pinned:
+            log.info("Сообщение id=%s уже обработано (найдена реакция 📌) — пропускаю.", entry.message_id)
+            return
+        embeds = entry.to_embeds()
+        # По дайджесту решают кнопками: ✅ на нём опубликовал бы первую новость со служебным footer
+        if digest.is_digest(embeds):
+            return
+        message = self.bot.get_partial_messageable(payload.channel_id).get_partial_message(payload.message_id)
+
+        # Получаем участника
+        guild = self.bot.get_guild(payload.guild_id) if payload.guild_id else None
+        member = await self._find_moderator(guild_cfg, guild, payload.user_id, payload.member)
+        if member is None:
+            return
+
+        emoji = str(payload.emoji)
+        if emoji == "✅":
+            if not embeds:
+                log.info("Сообщение id=%s не содержит embed для отправки в канал одобренных (raw).", message.id)
+                return
+
+            emb = embeds[0]
+            # news_id сбрасывается на выходе: реакции, переигранные в _on_promote, идут в одной задаче
+            with correlation(news=emb.url):
+                await self._approve_message(guild_cfg, message, emb, member)
+        elif emoji == "❌" and embeds:
+            await self._record_decision(guild_cfg, self._embed_news_id(embeds[0]), REJECTED, member)
+
+    @staticmethod
+    async def _find_moderator(guild_cfg: GuildConfig, guild: Optional[discord.Guild], user_id: int,
+                              member: Optional[discord.Member] = None) -> Optional[discord.Member]:
+        """Участник сервера с ролью модератора; None — не найден или роли нет"""
+        if guild and not member:
+            member = guild.get_member(user_id)
+            if not member:
+                try:
+                    member = await guild.fetch_member(user_id)
+                except Exception:
+                    member = None
+        if not member or not any(r.id == guild_cfg.moderator_role_id for r in member.roles):
+            return None
+        return member
+
+    async def _approve_message(self, guild_cfg: GuildConfig, message, emb: discord.Embed, member):
+        # Предотвращаем одновременную обработку одного и того же сообщения
+        if message.id in self.processing:
+            log.info("Сообщение id=%s уже обрабатывается — пропускаю.", message.id)
             return
+        self.processing.add(message.id)
+        try:
+            published = await self._publish(guild_cfg, emb)
+            await self._record_decision(guild_cfg, self._embed_news_id(emb), APPROVED, member)
+            if published:
+                # Пометим исходное сообщение реакцией, чтобы видно было, что оно обработано
+                try:
+                    await timed("discord_react", message.add_reaction("📌"))
+                    index.reacted(message.id, "📌", mine=True)
+                except Exception:
+                    pass
+        finally:
+            # Снимаем флаг обработки в любом случае
+            self.processing.discard(message.id)
 
-        # Попытаться получить канал
+    async def _fetch_indexed(self, guild_cfg: GuildConfig, payload: discord.RawReactionActionEvent) -> Optional[IndexedMessage]:
+        """Сообщения нет в индексе (старше окна сверки или сверка ещё идёт) — читаем его из API и запоминаем"""
         channel = self.bot.get_channel(payload.channel_id)
         if channel is None:
             try:
                 channel = await self.bot.fetch_channel(payload.channel_id)
             except Exception as e:
-                print("Не удалось получить канал для raw reaction:", e)
-                return
-
-        # Получаем сообщение
+                log.warning("Не удалось получить канал для raw reaction: %s", e)
+                return None
         try:
             message = await channel.fetch_message(payload.message_id)
         except Exception as e:
-            print("Не удалось получить сообщение для raw reaction:", e)
+            log.warning("Не удалось получить сообщение для raw reaction: %s", e)
+            return None
+        if message.author.id == self.bot.user.id:
+            self._index_message(guild_cfg, message)
+        return IndexedMessage.from_message(guild_cfg.guild_id, message)
+
+    async def _enqueue(self, guild_cfg: GuildConfig, channel_id: int, message_id: int, embed: discord.Embed):
+        """Ставит отправленную на модерацию новость в очередь (!queue / !approve / !reject)"""
+        if not embed.url:
             return
+        try:
+            await pending.add(guild_cfg.guild_id, embed.url, embed.title or '', channel_id, message_id, embed.to_dict())
+        except Exception as e:
+            log.warning("Не удалось поставить новость в очередь: %s", e)
 
-        # Если исходное сообщение уже помечено (📌), значит оно уже обработано — пропускаем
+    async def _record_decision(self, guild_cfg: GuildConfig, nid: Optional[str], state: str, moderator):
+        """Решение модератора в очереди. Одобрение засчитывается, только если новость действительно опубликована."""
+        if not nid or (state == APPROVED and not storage.published(nid, guild_cfg.guild_id)):
+            return
         try:
-            has_pin = False
-            for r in message.reactions:
-                try:
-                    if str(r.emoji) == '📌':
-                        has_pin = True
-                        break
-                except Exception:
-                    continue
-            if has_pin:
-                print(f"Сообщение id={message.id} уже обработано (найдена реакция 📌) — пропускаю.")
-                return
+            await pending.decide_news(guild_cfg.guild_id, nid, state, str(moderator))
+        except Exception as e:
+            log.warning("Не удалось записать решение по новости %s: %s", nid, e)
+
+    async def _publish_target(self, guild_cfg: GuildConfig):
+        """Форум-канал сервера (приоритет) или его канал одобренных"""
+        forum_channel = None
+        forum_id = guild_cfg.forum_channel_id
+        if forum_id:
+            try:
+                forum_channel = self.bot.get_channel(forum_id) or await self.bot.fetch_channel(forum_id)
+            except Exception:
+                forum_channel = None
+
+        target_channel = forum_channel or self.bot.get_channel(guild_cfg.approved_channel_id)
+        if not target_channel:
+            log.warning("Канал для одобренных не найден, сервер %s.", guild_cfg.guild_id)
+        return target_channel
+
+    @staticmethod
+    def _embed_news_id(emb: discord.Embed) -> Optional[str]:
+        """id новости: embed.url, для старых сообщений — 'id:' в footer"""
+        if getattr(emb, 'url', None):
+            return emb.url
+        try:
+            footer = emb.footer.text or ''
+            if 'id:' in footer:
+                return footer.split('id:')[-1].strip()
         except Exception:
             pass
+        return None
 
-        # Получаем участника
-        guild = message.guild
-        member = None
-        if guild:
-            member = guild.get_member(payload.user_id)
-            if not member:
-                try:
-                    member = await guild.fetch_member(payload.user_id)
-                except Exception:
-                    member = None
-        if not member:
-            return
+    async def _publish(self, guild_cfg: GuildConfig, emb: discord.Embed, check_history: bool = True) -> bool:
+        """Публикует одобренную новость на сервере. True — пост создан этим вызовом.
 
-        has_role = any(r.id == config.MODERATOR_ROLE_ID for r in member.roles)
-        if not has_role:
-            return
+        check_history=False — без просмотра истории целевого канала (массовое одобрение
+        полагается на отметки storage и блокировки публикаций).
+        """
+        nid = self._embed_news_id(emb)
+        publish_key = storage.published_key(nid or emb.title or '', guild_cfg.guild_id)
+        # Захват до проверки storage.published: между ней и mark_published есть await
+        if publish_key in self.publishing:
+            log.info("Новость id=%s уже публикуется — пропускаю.", nid)
+            return False
+        self.publishing.add(publish_key)
+        try:
+            return await self._publish_claimed(guild_cfg, emb, nid, publish_key, check_history)
+        finally:
+            self.publishing.discard(publish_key)
 
-        emoji = str(payload.emoji)
-        if emoji == "✅":
-            if not message.embeds:
-                print("Сообщение не содержит embed для отправки в канал одобренных (raw).")
-                return
+    async def _publish_claimed(self, guild_cfg: GuildConfig, emb: discord.Embed, nid: Optional[str],
+                               publish_key: str, check_history: bool) -> bool:
+        target_channel = await self._publish_target(guild_cfg)
+        if not target_channel:
+            return False
 
-            emb = message.embeds[0]
+        # Проверяем, не был ли уже опубликован пост с такой же ссылкой в целевом канале
+        try:
+            if nid and storage.published(nid, guild_cfg.guild_id):
+                log.info("Новость id=%s уже отмечена как опубликованная — пропускаю публикацию.", nid)
+                return False
 
-            # Предотвращаем одновременную обработку одного и того же сообщения
-            if message.id in self.processing:
-                print(f"Сообщение id={message.id} уже обрабатывается — пропускаю.")
-                return
-            self.processing.add(message.id)
-            try:
-                # Выбираем целевой форум-канал (приоритет) или канал APPROVED_CHANNEL_ID
-                forum_channel = None
-                forum_id = getattr(config, 'FORUM_CHANNEL_ID', 0) or 1436424801937002566
-                if forum_id:
+            # Если канал поддерживает history (не все типы, например ForumChannel в этой версии может не поддерживать), используем его как запасной способ поиска дубля
+            already = False
+            # После сверки дубли в канале уже перенесены в storage — историю читаем, только если сверки не было
+            if check_history and not index.ready(guild_cfg.guild_id) and hasattr(target_channel, 'history'):
+                async for m in target_channel.history(limit=200):
                     try:
-                        forum_channel = self.bot.get_channel(forum_id) or await self.bot.fetch_channel(forum_id)
+                        # сравниваем по ссылке: одинаковые заголовки ('『аниме』') бывают у разных новостей
+                        if m.embeds and emb.url and m.embeds[0].url == emb.url:
+                            already = True
+                            break
                     except Exception:
-                        forum_channel = None
+                        continue
 
-                target_channel = forum_channel or self.bot.get_channel(config.APPROVED_CHANNEL_ID)
-                if not target_channel:
-                    print("Канал для одобренных не найден (raw).")
-                    return
+            if already:
+                log.info("Пост со ссылкой '%s' уже существует в канале %s — пропускаю публикацию.", emb.url, target_channel.id)
+                return False
+        except Exception as e:
+            log.warning("Не удалось проверить историю/публикации целевого канала для дублей: %s", e)
 
-                # Проверяем, не был ли уже опубликован пост с таким же заголовком в целевом канале
-                try:
-                    # Сначала пытаемся получить id новости из embed.url (если он там есть)
-                    nid = None
-                    try:
-                        if getattr(emb, 'url', None):
-                            nid = emb.url
-                    except Exception:
-                        nid = None
-                    # fallback: если в embed не было url, попробуем footer (на случай старых сообщений)
-                    if not nid:
-                        try:
-                            footer = emb.footer.text or ''
-                            if 'id:' in footer:
-                                nid = footer.split('id:')[-1].strip()
-                        except Exception:
-                            nid = None
-
-                    if nid and storage.published(nid):
-                        print(f"Новость id={nid} уже отмечена как опубликованная — пропускаю публикацию.")
-                        return
-
-                    # Если канал поддерживает history (не все типы, например ForumChannel в этой версии может не поддерживать), используем его как запасной способ поиска дубля
-                    already = False
-                    if hasattr(target_channel, 'history'):
-                        async for m in target_channel.history(limit=200):
-                            try:
-                                if m.embeds and m.embeds[0].title == (emb.title or ''):
-                                    already = True
-                                    break
-                            except Exception:
-                                continue
-                    else:
-                        # если history недоступен, не пытаемся сканировать — полагаемся на storage.published
-                        already = False
-
-                    if already:
-                        print(f"Пост с заголовком '{emb.title}' уже существует в канале {target_channel.id} — пропускаю публикацию.")
-                        return
-                except Exception as e:
-                    print("Не удалось проверить историю/публикации целевого канала для дублей:", e)
+        # Блокировка публикации общая для всех экземпляров (HA): второй экземпляр не задвоит пост
+        if not await ha.acquire_publish(publish_key):
+            log.info("Новость id=%s публикует или уже опубликовал другой экземпляр — пропускаю.", nid)
+            return False
 
-                # Публикуем: если есть create_thread (ForumChannel), используем его; иначе fallback на send
+        # Публикуем: если есть create_thread (ForumChannel), используем его; иначе fallback на send
+        try:
+            name = emb.title or 'Новость'
+            if hasattr(target_channel, 'create_thread') and callable(getattr(target_channel, 'create_thread')):
                 try:
-                    name = emb.title or 'Новость'
-                    if hasattr(target_channel, 'create_thread') and callable(getattr(target_channel, 'create_thread')):
-                        try:
-                            result = await target_channel.create_thread(name=name, embed=emb)
-                            # result is (thread, message) namedtuple
-                            try:
-                                thread = getattr(result, 'thread', None) or (result[0] if isinstance(result, tuple) else None)
-                                msg_created = getattr(result, 'message', None) or (result[1] if isinstance(result, tuple) and len(result) > 1 else None)
-                                print(f"create_thread returned thread={getattr(thread,'id', None)} message={getattr(msg_created,'id', None)}")
-                            except Exception:
-                                pass
-                        except TypeError:
-                            try:
-                                result = await target_channel.create_thread(name=name, content=None, embed=emb)
-                                try:
-                                    thread = getattr(result, 'thread', None) or (result[0] if isinstance(result, tuple) else None)
-                                    msg_created = getattr(result, 'message', None) or (result[1] if isinstance(result, tuple) and len(result) > 1 else None)
-                                    print(f"create_thread returned thread={getattr(thread,'id', None)} message={getattr(msg_created,'id', None)}")
-                                except Exception:
-                                    pass
-                            except Exception as e:
-                                print('Ошибка при create_thread с content fallback:', e)
-                                # fallback на send
-                                await target_channel.send(embed=emb)
-                        except Exception as e:
-                            print('Ошибка при вызове create_thread:', e)
-                            # fallback на send
-                            await target_channel.send(embed=emb)
-                    else:
-                        await target_channel.send(embed=emb)
-
-                    print(f"Новость отправлена в канал одобренных (raw): id={message.id} target={target_channel.id}")
-
-                    # Пометим исходное сообщение реакцией, чтобы видно было, что оно обработано
+                    result = await timed("discord_thread", target_channel.create_thread(name=name, embed=emb, files=resolver.attachments([emb])))
+                    # result is (thread, message) namedtuple
                     try:
-                        await message.add_reaction("📌")
+                        thread = getattr(result, 'thread', None) or (result[0] if isinstance(result, tuple) else None)
+                        msg_created = getattr(result, 'message', None) or (result[1] if isinstance(result, tuple) and len(result) > 1 else None)
+                        log.debug("create_thread returned thread=%s message=%s", getattr(thread, 'id', None), getattr(msg_created, 'id', None))
                     except Exception:
                         pass
-
-                    # Сначала пытаемся получить id новости из embed.url
+                except TypeError:
                     try:
-                        nid = None
+                        result = await timed("discord_thread", target_channel.create_thread(name=name, content=None, embed=emb, files=resolver.attachments([emb])))
                         try:
-                            if getattr(emb, 'url', None):
-                                nid = emb.url
+                            thread = getattr(result, 'thread', None) or (result[0] if isinstance(result, tuple) else None)
+                            msg_created = getattr(result, 'message', None) or (result[1] if isinstance(result, tuple) and len(result) > 1 else None)
+                            log.debug("create_thread returned thread=%s message=%s", getattr(thread, 'id', None), getattr(msg_created, 'id', None))
                         except Exception:
-                            nid = None
-                        # fallback: если в embed не было url, попробуем footer (на случай старых сообщений)
-                        if not nid:
-                            try:
-                                footer = emb.footer.text or ''
-                                if 'id:' in footer:
-                                    nid = footer.split('id:')[-1].strip()
-                            except Exception:
-                                nid = None
-                        if nid:
-                            storage.mark_published(nid)
-                    except Exception:
-                        pass
-
+                            pass
+                    except Exception as e:
+                        log.warning('Ошибка при create_thread с content fallback: %s', e)
+                        # fallback на send
+                        await timed("discord_send", target_channel.send(embed=emb, files=resolver.attachments([emb])))
                 except Exception as e:
-                    print("Ошибка при отправке одобренной новости (raw):", e)
-            finally:
-                # Снимаем флаг обработки в любом случае
+                    log.warning('Ошибка при вызове create_thread: %s', e)
+                    # fallback на send
+                    await timed("discord_send", target_channel.send(embed=emb, files=resolver.attachments([emb])))
+            else:
+                await timed("discord_send", target_channel.send(embed=emb, files=resolver.attachments([emb])))
+        except Exception as e:
+            log.exception("Ошибка при отправке одобренной новости: %s", e)
+            await ha.release_publish(publish_key)
+            return False
+
+        log.info("Новость id=%s опубликована: target=%s", nid, target_channel.id)
+        # Отмечаем сразу после публикации — до любых других запросов к API
+        if nid:
+            try:
+                storage.mark_published(nid, guild_cfg.guild_id)
+            except Exception as e:
+                log.warning("Не удалось отметить публикацию id=%s: %s", nid, e)
+        await ha.finish_publish(publish_key)
+        return True
+
+    # --- дайджест ---
+
+    async def _send_digest(self, guild_cfg: GuildConfig, embeds: List[discord.Embed]):
+        """Одно сообщение модерации на пачку новостей: до 10 embed'ов и select'ы одобрения"""
+        channel = self.bot.get_channel(guild_cfg.moderation_channel_id)
+        if not channel:
+            log.warning("Канал модерации сервера %s не найден.", guild_cfg.guild_id)
+            return
+        numbered = [digest.numbered(e, i) for i, e in enumerate(embeds)]
+        try:
+            msg = await timed("discord_send", channel.send(
+                content=digest.summary(numbered), embeds=numbered, view=digest.build_view(numbered),
+                files=resolver.attachments(numbered)))
+        except Exception as e:
+            log.warning("Error sending digest: %s", e)
+            return
+        log.info("Отправлен дайджест id=%s (%d новостей) в канал %s (сервер %s)",
+                 getattr(msg, 'id', None), len(embeds), channel.id, guild_cfg.guild_id)
+        for embed in embeds:
+            await self._enqueue(guild_cfg, channel.id, msg.id, embed)
+        self._index_message(guild_cfg, msg)
+
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: discord.Interaction):
+        if interaction.type is not discord.InteractionType.component:
+            return
+        custom_id = (interaction.data or {}).get("custom_id", "")
+        # Отвечает только ведущий экземпляр: ответ на взаимодействие может быть лишь один
+        if not custom_id.startswith(digest.CUSTOM_ID_PREFIX) or not ha.is_leader:
+            return
+        with correlation(tick=new_tick_id("digest")):
+            await self._handle_digest_interaction(interaction, custom_id)
+
+    async def _handle_digest_interaction(self, interaction: discord.Interaction, custom_id: str):
+        guild_cfg = self._guild_for_moderation_channel(interaction.channel_id)
+        member = interaction.user
+        if guild_cfg is None or not any(r.id == guild_cfg.moderator_role_id for r in getattr(member, "roles", [])):
+            await interaction.response.send_message("Решения по новостям принимают только модераторы.", ephemeral=True)
+            return
+        message = interaction.message
+        if message.id in self.processing:
+            await interaction.response.send_message("Дайджест сейчас обновляется — попробуй ещё раз.", ephemeral=True)
+            return
+
+        self.processing.add(message.id)
+        try:
+            state = digest.APPROVED if custom_id == digest.APPROVE_ID else digest.REJECTED
+            embeds = list(message.embeds)
+            chosen = []
+            for value in interaction.data.get("values", []):
+                i = int(value)
+                if i < len(embeds) and digest.item_state(embeds[i]) == digest.PENDING:
+                    embeds[i] = digest.mark(embeds[i], state, member.display_name)
+                    chosen.append(i)
+            # Ответ на взаимодействие и есть правка дайджеста — отдельного запроса на edit не нужно
+            await timed("discord_interaction", interaction.response.edit_message(
+                content=digest.summary(embeds), embeds=embeds, view=digest.build_view(embeds)))
+            log.info("Дайджест id=%s: %s %s", message.id, state, [embeds[i].url for i in chosen])
+            if state == digest.REJECTED:
+                for i in chosen:
+                    await self._record_decision(guild_cfg, embeds[i].url, REJECTED, member)
+
+            if state != digest.APPROVED and config.DIGEST_PUBLISH != "digest":
+                return
+            if config.DIGEST_PUBLISH == "digest":
+                # Тред-дайджест публикуется, когда по всем новостям пачки принято решение
+                if chosen and not digest.pending(embeds):
+                    approved = [digest.clean(e) for e in embeds if digest.item_state(e) == digest.APPROVED]
+                    if approved:
+                        await self._publish_digest(guild_cfg, approved)
+                        for emb in approved:
+                            await self._record_decision(guild_cfg, emb.url, APPROVED, member)
+                return
+            for i in chosen:
+                with correlation(news=embeds[i].url):
+                    await self._publish(guild_cfg, digest.clean(embeds[i]))
+                    await self._record_decision(guild_cfg, embeds[i].url, APPROVED, member)
+        finally:
+            self.processing.discard(message.id)
+
+    async def _publish_digest(self, guild_cfg: GuildConfig, embeds: List[discord.Embed]):
+        """Одобренные новости пачки — одним постом (в форуме — одним тредом)"""
+        target_channel = await self._publish_target(guild_cfg)
+        if not target_channel:
+            return
+        claimed = []
+        try:
+            await self._publish_digest_claimed(guild_cfg, target_channel, embeds, claimed)
+        finally:
+            self.publishing.difference_update(claimed)
+
+    async def _publish_digest_claimed(self, guild_cfg: GuildConfig, target_channel, embeds: List[discord.Embed],
+                                      claimed: List[str]):
+        batch = []
+        for emb in embeds:
+            nid = self._embed_news_id(emb)
+            publish_key = storage.published_key(nid or emb.title or '', guild_cfg.guild_id)
+            # Захват в процессе — как в _publish, до проверки storage
+            if publish_key in self.publishing or (nid and storage.published(nid, guild_cfg.guild_id)):
+                continue
+            self.publishing.add(publish_key)
+            claimed.append(publish_key)
+            if await ha.acquire_publish(publish_key):
+                batch.append((emb, nid, publish_key))
+        if not batch:
+            return
+
+        name = f"Дайджест новостей {datetime.now():%d.%m.%Y %H:%M}"
+        embeds = [b[0] for b in batch]
+        try:
+            if isinstance(target_channel, discord.ForumChannel):
+                await timed("discord_thread", target_channel.create_thread(
+                    name=name, embeds=embeds, files=resolver.attachments(embeds)))
+            else:
+                await timed("discord_send", target_channel.send(
+                    content=name, embeds=embeds, files=resolver.attachments(embeds)))
+        except Exception as e:
+            log.exception("Ошибка при публикации дайджеста: %s", e)
+            for _, _, publish_key in batch:
+                await ha.release_publish(publish_key)
+            return
+
+        log.info("Дайджест из %d новостей опубликован: target=%s", len(batch), target_channel.id)
+        for _, nid, publish_key in batch:
+            if nid:
                 try:
-                    self.processing.discard(message.id)
-                except Exception:
-                    pass
+                    storage.mark_published(nid, guild_cfg.guild_id)
+                except Exception as e:
+                    log.warning("Не удалось отметить публикацию id=%s: %s", nid, e)
+            await ha.finish_publish(publish_key)
+
+    @commands.hybrid_command(name="subscribe")
+    @commands.guild_only()
+    @commands.has_guild_permissions(manage_guild=True)
+    async def subscribe(self, ctx, moderation_channel: discord.TextChannel, moderator_role: discord.Role,
+                        approved_channel: Optional[discord.TextChannel] = None,
+                        forum_channel: Optional[discord.ForumChannel] = None):
+        """Подписывает сервер на новости: канал модерации, роль модераторов, канал одобренных/форум."""
+        if not approved_channel and not forum_channel:
+            await ctx.send("Укажи канал для одобренных новостей или форум.")
+            return
+        guild_cfg = GuildConfig(
+            guild_id=ctx.guild.id,
+            moderation_channel_id=moderation_channel.id,
+            moderator_role_id=moderator_role.id,
+            approved_channel_id=approved_channel.id if approved_channel else 0,
+            forum_channel_id=forum_channel.id if forum_channel else 0,
+        )
+        storage.set_guild_config(guild_cfg)
+        # Каналы могли использоваться и раньше — сверяем их в фоне, ответ не ждёт
+        task = asyncio.create_task(self._fan_out([guild_cfg], self._reconcile_guild))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        await ctx.send(f"✅ Сервер подписан: модерация в {moderation_channel.mention}, роль {moderator_role.name}.")
+
+    @commands.hybrid_command(name="unsubscribe")
+    @commands.guild_only()
+    @commands.has_guild_permissions(manage_guild=True)
+    async def unsubscribe(self, ctx):
+        """Отписывает сервер от рассылки новостей."""
+        if storage.remove_guild_config(ctx.guild.id):
+            await ctx.send("Сервер отписан от новостей.")
+        else:
+            await ctx.send("Сервер и так не подписан.")
+
+    @commands.hybrid_command(name="guildconfig")
+    @commands.guild_only()
+    async def guild_config(self, ctx):
+        """Показывает настройки рассылки для текущего сервера."""
+        guild_cfg = storage.get_guild_config(ctx.guild.id)
+        if guild_cfg is None:
+            await ctx.send("Сервер не подписан. Используй !subscribe.")
+            return
+        await ctx.send(
+            f"Модерация: <#{guild_cfg.moderation_channel_id}>\n"
+            f"Роль модераторов: <@&{guild_cfg.moderator_role_id}>\n"
+            f"Канал одобренных: {f'<#{guild_cfg.approved_channel_id}>' if guild_cfg.approved_channel_id else '—'}\n"
+            f"Форум: {f'<#{guild_cfg.forum_channel_id}>' if guild_cfg.forum_channel_id else '—'}"
+        )
+
+    @commands.hybrid_command(name="stats")
+    @commands.guild_only()
+    async def stats(self, ctx):
+        """Сводка метрик: стадии, REST-вызовы, кеши (только для модераторов)."""
+        if not self._is_moderator(ctx.author):
+            await ctx.send("Команда доступна только модераторам.")
+            return
+
+        lines = ["**Стадии** (вызовов · среднее · ошибок)"]
+        for (stage_name,), data in sorted(STAGE_SECONDS.values.items()):
+            count, total = data[-1], data[-2]
+            errors = int(STAGE_ERRORS.get(stage=stage_name))
+            lines.append(f"`{stage_name}`: {count} · {total / count * 1000:.1f} мс · {errors}")
+
+        lines.append("**Обработчик реакций**")
+        count, total = REACTION_HANDLER_SECONDS.summary()
+        lines.append(f"{count} событий · {total / count * 1000:.1f} мс в среднем" if count else "событий не было")
+
+        lines.append("**REST-вызовы Discord** (топ-8)")
+        by_route = {}
+        for (route, _outcome), value in REST_REQUESTS.values.items():
+            by_route[route] = by_route.get(route, 0) + value
+        for route, value in sorted(by_route.items(), key=lambda kv: -kv[1])[:8]:
+            lines.append(f"`{route}`: {int(value)}")
+
+        lines.append("**Event loop**")
+        lines.append(watchdog.summary())
 
-    @commands.command(name="checkperms")
-    async def check_perms(self, ctx, channel_id: int = None):
+        lines.append("**Кеши**")
+        ratio = cache_hit_ratio("seen")
+        lines.append(f"seen: {ratio:.0%} попаданий" if ratio is not None else "seen: нет обращений")
+
+        for host, gov in sorted(all_governors().items()):
+            c = gov.counters
+            lines.append(f"**{host}**: {gov.state}, запросов {int(c['requests'])}, повторов {int(c['retries'])}, "
+                         f"ошибок {int(c['failures'])}, отказов без запроса {int(c['short_circuited'])}")
+
+        await ctx.send("\n".join(lines)[:2000])
+
+    # --- очередь модерации ---
+
+    @staticmethod
+    def _parse_ids(text: str) -> Optional[List[int]]:
+        """'12 13,#14' -> [12, 13, 14]; None, если есть что-то кроме id"""
+        tokens = [t.lstrip('#') for t in re.split(r"[\s,]+", text.strip()) if t]
+        if not tokens or not all(t.isdigit() for t in tokens):
+            return None
+        return [int(t) for t in tokens]
+
+    @staticmethod
+    def _parse_age(text: str) -> Optional[float]:
+        """'older-than 12h' / '3d' / '90m' -> секунды"""
+        m = re.fullmatch(r"(?:older[-_ ]?than\s*)?(\d+)\s*([mhdw])", text.strip().lower())
+        if not m:
+            return None
+        return int(m.group(1)) * {"m": 60, "h": 3600, "d": 86400, "w": 604800}[m.group(2)]
+
+    @staticmethod
+    def _format_age(seconds: float) -> str:
+        if seconds < 3600:
+            return f"{int(seconds // 60)} мин"
+        if seconds < 86400:
+            return f"{int(seconds // 3600)} ч"
+        return f"{int(seconds // 86400)} д"
+
+    async def _moderation_guild(self, ctx) -> Optional[GuildConfig]:
+        """Настройки сервера для команд очереди; None (с ответом) — не сервер или не модератор"""
+        guild_cfg = self._guild_config_for(ctx.guild)
+        if guild_cfg is None:
+            await ctx.send("Сервер не подписан. Используй !subscribe.")
+            return None
+        if not self._is_moderator(ctx.author):
+            await ctx.send("Команда доступна только модераторам.")
+            return None
+        return guild_cfg
+
+    async def _bulk_publish(self, guild_cfg: GuildConfig, items) -> int:
+        """Публикует записи очереди параллельно (не больше PUBLISH_CONCURRENCY сразу); возвращает число новых постов.
+
+        Темп запросов держит сам discord.py: он ждёт по bucket'ам route и по 429.
+        """
+        embeds = [discord.Embed.from_dict(item.embed) for item in items]
+        if config.DIGEST_PUBLISH == "digest":
+            before = sum(storage.published(item.news_id, guild_cfg.guild_id) for item in items)
+            for start in range(0, len(embeds), digest.DIGEST_MAX_ITEMS):
+                await self._publish_digest(guild_cfg, embeds[start:start + digest.DIGEST_MAX_ITEMS])
+            return sum(storage.published(item.news_id, guild_cfg.guild_id) for item in items) - before
+
+        semaphore = asyncio.Semaphore(config.PUBLISH_CONCURRENCY)
+
+        async def publish_one(item, embed) -> bool:
+            async with semaphore:
+                with correlation(news=item.news_id):
+                    return await self._publish(guild_cfg, embed, check_history=False)
+
+        results = await asyncio.gather(*(publish_one(i, e) for i, e in zip(items, embeds)))
+        return sum(results)
+
+    @commands.hybrid_command(name="queue")
+    @commands.guild_only()
+    async def queue(self, ctx, limit: int = 20):
+        """Новости, ожидающие решения: id, возраст, заголовок (только для модераторов)."""
+        guild_cfg = await self._moderation_guild(ctx)
+        if guild_cfg is None:
+            return
+        items = await pending.list_pending(guild_cfg.guild_id, max(1, min(limit, 50)))
+        total = await pending.count_pending(guild_cfg.guild_id)
+        if not total:
+            await ctx.send("Очередь пуста.")
+            return
+        now = time.time()
+        lines = [f"**В очереди: {total}**" + (f" (самые старые {len(items)})" if total > len(items) else "")]
+        for item in items:
+            lines.append(f"`#{item.id}` {self._format_age(now - item.created_at)} — [{item.title[:80]}](<{item.news_id}>)")
+        lines.append("`!approve <id…|all>` · `!reject <id…|older-than 12h>`")
+        await ctx.send("\n".join(lines)[:2000])
+
+    @commands.hybrid_command(name="approve")
+    @commands.guild_only()
+    async def approve(self, ctx, *, targets: str):
+        """Одобряет и публикует новости из очереди: id через пробел/запятую или all."""
+        guild_cfg = await self._moderation_guild(ctx)
+        if guild_cfg is None:
+            return
+        if targets.strip().lower() == "all":
+            items = await pending.list_pending(guild_cfg.guild_id)
+        else:
+            ids = self._parse_ids(targets)
+            if ids is None:
+                await ctx.send("Укажи id из !queue через пробел или all.")
+                return
+            items = await pending.get_pending(guild_cfg.guild_id, ids)
+        if not items:
+            await ctx.send("Таких новостей в очереди нет.")
+            return
+
+        await ctx.send(f"⏳ Публикую {len(items)}...")
+        started = time.perf_counter()
+        published = await self._bulk_publish(guild_cfg, items)
+        done = [item.id for item in items if storage.published(item.news_id, guild_cfg.guild_id)]
+        await pending.decide(guild_cfg.guild_id, done, APPROVED, str(ctx.author))
+        log.info("!approve: %d из %d опубликовано за %.1f с (%s)", published, len(items),
+                 time.perf_counter() - started, ctx.author)
+        failed = len(items) - len(done)
+        await ctx.send(f"✅ Опубликовано {published} из {len(items)} за {time.perf_counter() - started:.1f} с."
+                       + (f" Не удалось: {failed} — остались в очереди." if failed else ""))
+
+    @commands.hybrid_command(name="reject")
+    @commands.guild_only()
+    async def reject(self, ctx, *, targets: str):
+        """Отклоняет новости из очереди: id через пробел/запятую или older-than 12h (m/h/d/w)."""
+        guild_cfg = await self._moderation_guild(ctx)
+        if guild_cfg is None:
+            return
+        age = self._parse_age(targets)
+        if age is not None:
+            items = await pending.pending_older_than(guild_cfg.guild_id, age)
+        else:
+            ids = self._parse_ids(targets)
+            if ids is None:
+                await ctx.send("Укажи id из !queue или older-than 12h.")
+                return
+            items = await pending.get_pending(guild_cfg.guild_id, ids)
+        count = await pending.decide(guild_cfg.guild_id, [item.id for item in items], REJECTED, str(ctx.author))
+        await ctx.send(f"❌ Отклонено: {count}.")
+
+    @commands.hybrid_command(name="profile")
+    @commands.guild_only()
+    async def profile(self, ctx, seconds: int = 10, mode: str = "cprofile"):
+        """Профиль живого процесса за N секунд: cprofile или sample (только для модераторов)."""
+        if not self._is_moderator(ctx.author):
+            await ctx.send("Команда доступна только модераторам.")
+            return
+        if mode not in ("cprofile", "sample"):
+            await ctx.send("Режим: cprofile или sample.")
+            return
+        if watchdog.profiling:
+            await ctx.send("Профилирование уже идёт.")
+            return
+        seconds = max(1, min(seconds, config.PROFILE_MAX_SECONDS))
+        await ctx.send(f"⏱️ Снимаю профиль ({mode}) за {seconds} с...")
+        report = await watchdog.profile(seconds, mode)
+        log.info("Профиль (%s, %d с) снят по запросу %s", mode, seconds, ctx.author)
+        await ctx.send(
+            f"```\n{watchdog.summary()[:1800]}\n```",
+            file=discord.File(io.BytesIO(report.encode("utf-8")), filename=f"profile-{mode}.txt"),
+        )
+
+    @commands.hybrid_command(name="checkperms")
+    async def check_perms(self, ctx, channel_id: Optional[str] = None):
         """Показывает права бота в указанном канале (по умолчанию текущий)."""
+        # id строкой: snowflake не помещается в целочисленный параметр slash-команды
         channel = None
         if channel_id:
+            try:
+                channel_id = int(channel_id)
+            except ValueError:
+                await ctx.send("Некорректный id канала.")
+                return
             channel = self.bot.get_channel(channel_id)
             if channel is None:
                 try:
@@ -431,17 +1151,19 @@ class Moderation(commands.Cog):
         except Exception:
             overwrites = None
         await ctx.send(f"Права бота в канале {channel.id}: {perms}\nТип канала: {getattr(channel,'type',None)}\nOverwrites: {overwrites}")
-        print(f"checkperms: channel={channel.id} type={getattr(channel,'type',None)} bot_member={bot_member} perms={perms} overwrites={overwrites}")
+        log.debug("checkperms: channel=%s type=%s bot_member=%s perms=%s overwrites=%s",
+                  channel.id, getattr(channel, 'type', None), bot_member, perms, overwrites)
 
-    @commands.command(name="testreact")
+    @commands.hybrid_command(name="testreact")
     async def test_react(self, ctx):
         """Отправляет тестовое сообщение и пытается добавить реакции (отладка)."""
         try:
             test_msg = await ctx.send("Test reactions: добавляю ✅ и ❌")
-            print(f"testreact: sent msg type={type(test_msg)} id={getattr(test_msg,'id',None)} author={getattr(test_msg,'author',None)} webhook_id={getattr(test_msg,'webhook_id',None)}")
+            log.debug("testreact: sent msg type=%s id=%s author=%s webhook_id=%s", type(test_msg), getattr(test_msg, 'id', None),
+                      getattr(test_msg, 'author', None), getattr(test_msg, 'webhook_id', None))
         except Exception as e:
             await ctx.send(f"Не удалось отправить тестовое сообщение: {e}")
-            print("testreact: send failed", e)
+            log.warning("testreact: send failed: %s", e)
             return
 
         # fallback fetch
@@ -450,17 +1172,17 @@ class Moderation(commands.Cog):
                 fetched = await ctx.channel.fetch_message(getattr(test_msg,'id',None))
                 if fetched:
                     test_msg = fetched
-                    print(f"testreact: fetched message id={test_msg.id} type={type(test_msg)})")
+                    log.debug("testreact: fetched message id=%s type=%s", test_msg.id, type(test_msg))
             except Exception as e:
-                print("testreact: fetch failed", e)
+                log.warning("testreact: fetch failed: %s", e)
 
         for emoji in ("✅","❌"):
             try:
                 await test_msg.add_reaction(emoji)
-                print(f"testreact: added {emoji} to id={getattr(test_msg,'id',None)}")
+                log.debug("testreact: added %s to id=%s", emoji, getattr(test_msg, 'id', None))
             except Exception as e:
                 await ctx.send(f"Ошибка при добавлении реакции {emoji}: {e}")
-                print(f"testreact: failed add {emoji}", e)
+                log.warning("testreact: failed add %s: %s", emoji, e)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Moderation(bot))
\ No newline at end of file
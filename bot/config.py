@@ -1,8 +1,28 @@
 import os
+from dataclasses import dataclass, asdict
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+@dataclass
+class GuildConfig:
+    """Настройки одного сервера: куда слать новости на модерацию и куда публиковать"""
+    guild_id: int
+    moderation_channel_id: int
+    moderator_role_id: int
+    approved_channel_id: int = 0
+    forum_channel_id: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GuildConfig":
+        return cls(**{k: int(data.get(k) or 0) for k in cls.__dataclass_fields__})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
 class Config:
     TOKEN = os.getenv("DISCORD_TOKEN")
     MODERATION_CHANNEL_ID = int(os.getenv("MODERATION_CHANNEL_ID", "0"))
@@ -11,5 +31,95 @@ class Config:
     CHECK_INTERVAL_MINUTES = int(os.getenv("CHECK_INTERVAL_MINUTES", "10"))
     NEWS_LIMIT = int(os.getenv("NEWS_LIMIT", "6"))
     FORUM_CHANNEL_ID = int(os.getenv("FORUM_CHANNEL_ID", "0"))
+    # Лёгкий режим gateway: минимум intents, без кеша участников, команды — slash
+    LEAN_GATEWAY = os.getenv("LEAN_GATEWAY", "0").lower() in ("1", "true", "yes")
+    # Размер кеша сообщений discord.py (0 — отключён)
+    MAX_MESSAGES = int(os.getenv("MAX_MESSAGES", "0" if LEAN_GATEWAY else "1000"))
+    # Синхронизировать slash-команды при старте (в лёгком режиме без этого команды недоступны)
+    SYNC_APP_COMMANDS = os.getenv("SYNC_APP_COMMANDS", "1" if LEAN_GATEWAY else "0").lower() in ("1", "true", "yes")
+    # Сколько серверов получают новость одновременно
+    FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "5"))
+    # Включённые источники новостей (через запятую); у каждого свой интервал:
+    # SOURCE_<NAME>_INTERVAL_MINUTES и SOURCE_<NAME>_LIMIT, по умолчанию — общие значения
+    NEWS_SOURCES = [s.strip().lower() for s in os.getenv("NEWS_SOURCES", "mal").split(",") if s.strip()]
+    # Устарело: как MAL отдаёт список новостей — теперь SOURCE_MAL_LISTING (см. MALSource)
+    NEWS_SOURCE = os.getenv("NEWS_SOURCE", "").lower()
+    # Максимальное расстояние Хэмминга между simhash-отпечатками, при котором новости считаются дублями (0..3)
+    DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))
+
+    # Локальный эндпоинт /metrics в формате Prometheus (0 — выключен)
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+    # Ограничение исходящих запросов (на каждый хост отдельно)
+    HTTP_RATE_PER_SECOND = float(os.getenv("HTTP_RATE_PER_SECOND", "1"))
+    HTTP_BURST = int(os.getenv("HTTP_BURST", "3"))
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+    HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "15"))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "60"))
+
+    # Логи: уровень, формат ("text" — key=value, "json" — одна JSON-строка на запись)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+    # Не больше LOG_RATE_LIMIT_BURST одинаковых сообщений за LOG_RATE_LIMIT_WINDOW секунд (0 — без ограничения)
+    LOG_RATE_LIMIT_BURST = int(os.getenv("LOG_RATE_LIMIT_BURST", "20"))
+    LOG_RATE_LIMIT_WINDOW = float(os.getenv("LOG_RATE_LIMIT_WINDOW", "60"))
+
+    # Сторож event loop: как часто мерить лаг и с какого лага считать loop зависшим
+    LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+    LOOP_STALL_THRESHOLD_SECONDS = float(os.getenv("LOOP_STALL_THRESHOLD_SECONDS", "0.25"))
+    # Режим отладки asyncio (slow_callback_duration = порог зависания); заметно замедляет работу
+    LOOP_DEBUG = os.getenv("LOOP_DEBUG", "0").lower() in ("1", "true", "yes")
+    # Максимальная длительность !profile, секунды
+    PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+    # Ведущий/резервный режим: экземпляры делят аренду и блокировки публикаций в общем SQLite-файле
+    HA_ENABLED = os.getenv("HA_ENABLED", "0").lower() in ("1", "true", "yes")
+    HA_DB_PATH = os.getenv("HA_DB_PATH", "data/ha.sqlite3")
+    # Имя экземпляра (по умолчанию hostname:pid:случайный суффикс)
+    HA_INSTANCE_ID = os.getenv("HA_INSTANCE_ID", "")
+    HA_LEASE_SECONDS = float(os.getenv("HA_LEASE_SECONDS", "10"))
+    HA_RENEW_SECONDS = float(os.getenv("HA_RENEW_SECONDS", "3"))
+    # Сколько держится блокировка публикации экземпляра, который упал посреди публикации
+    PUBLISH_LOCK_SECONDS = float(os.getenv("PUBLISH_LOCK_SECONDS", "120"))
+
+    # Дайджест: новые новости тика одним сообщением (до 10 embed'ов) с select'ами одобрения вместо реакций
+    DIGEST_MODE = os.getenv("DIGEST_MODE", "0").lower() in ("1", "true", "yes")
+    # Как публиковать одобренное из дайджеста: "item" — каждая новость отдельно, "digest" — одним тредом на пачку
+    DIGEST_PUBLISH = os.getenv("DIGEST_PUBLISH", "item").lower()
+
+    # Очередь модерации (!queue / !approve / !reject)
+    PENDING_DB_PATH = os.getenv("PENDING_DB_PATH", "data/pending.sqlite3")
+    # Сколько публикаций !approve идёт одновременно
+    PUBLISH_CONCURRENCY = int(os.getenv("PUBLISH_CONCURRENCY", "5"))
+
+    # Картинки: проверенные URL кешируются в файле на IMAGE_CACHE_TTL_HOURS
+    IMAGE_CACHE_PATH = os.getenv("IMAGE_CACHE_PATH", "data/images.json")
+    IMAGE_CACHE_TTL_HOURS = float(os.getenv("IMAGE_CACHE_TTL_HOURS", "168"))
+    # Перезаливать картинку вложением (ужатой до IMAGE_REHOST_MAX_SIDE px, если установлен Pillow)
+    IMAGE_REHOST = os.getenv("IMAGE_REHOST", "0").lower() in ("1", "true", "yes")
+    IMAGE_REHOST_MAX_SIDE = int(os.getenv("IMAGE_REHOST_MAX_SIDE", "1280"))
+    IMAGE_DIR = os.getenv("IMAGE_DIR", "data/images")
+
+    # Сверка при старте: сколько последних сообщений канала модерации (и постов в канале публикаций) читать
+    RECONCILE_HISTORY_LIMIT = int(os.getenv("RECONCILE_HISTORY_LIMIT", "200"))
+
+    def default_guild(self) -> Optional[GuildConfig]:
+        """Сервер из .env (односерверный режим); guild_id=0 — публикации хранятся без префикса"""
+        if not self.MODERATION_CHANNEL_ID:
+            return None
+        return GuildConfig(
+            guild_id=0,
+            moderation_channel_id=self.MODERATION_CHANNEL_ID,
+            moderator_role_id=self.MODERATOR_ROLE_ID,
+            approved_channel_id=self.APPROVED_CHANNEL_ID,
+            forum_channel_id=self.FORUM_CHANNEL_ID,
+        )
+
+    @staticmethod
+    def source_setting(source: str, key: str, default=None):
+        """Настройка конкретного источника: SOURCE_<NAME>_<KEY> из окружения"""
+        return os.getenv(f"SOURCE_{source.upper()}_{key}", default)
 
 config = Config()
@@ -0,0 +1,106 @@
+import hashlib
+import re
+from typing import Dict, Iterable, Optional, Set
+
+# 64-битный simhash режется на BANDS полос; два отпечатка с расстоянием Хэмминга
+# меньше BANDS обязательно совпадают хотя бы в одной полосе (принцип Дирихле),
+# поэтому поиск кандидатов идёт по хеш-таблицам полос, а не по всей истории.
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text: str) -> Iterable[str]:
+    words = _WORD_RE.findall((text or "").lower())
+    yield from words
+    # биграммы немного учитывают порядок слов
+    for a, b in zip(words, words[1:]):
+        yield f"{a} {b}"
+
+
+def _hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str, title: str = "", title_weight: int = 2) -> Optional[int]:
+    """64-битный simhash текста; токены заголовка весят больше. None для пустого текста."""
+    weights = [0] * HASH_BITS
+    seen_any = False
+    for source, weight in ((title, title_weight), (text, 1)):
+        for token in _tokens(source):
+            seen_any = True
+            h = _hash(token)
+            for bit in range(HASH_BITS):
+                weights[bit] += weight if h >> bit & 1 else -weight
+    if not seen_any:
+        return None
+    fp = 0
+    for bit, w in enumerate(weights):
+        if w > 0:
+            fp |= 1 << bit
+    return fp
+
+
+def fingerprint(item: Dict) -> Optional[int]:
+    """Отпечаток новости по оригинальному (английскому) заголовку и тексту"""
+    title = item.get("original_title") or item.get("title") or ""
+    excerpt = item.get("original_excerpt") or item.get("excerpt") or ""
+    return simhash(excerpt, title=title)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class FingerprintIndex:
+    """Индекс отпечатков с поиском почти-дублей по полосам simhash"""
+
+    def __init__(self, max_distance: int = BANDS - 1):
+        # больше BANDS - 1 полосы не гарантируют нахождение всех кандидатов
+        self.max_distance = min(max_distance, BANDS - 1)
+        self._by_id: Dict[str, int] = {}
+        self._bands = [dict() for _ in range(BANDS)]  # значение полосы -> множество id
+
+    def __len__(self):
+        return len(self._by_id)
+
+    @staticmethod
+    def _band_keys(fp: int):
+        return [(fp >> (i * BAND_BITS)) & BAND_MASK for i in range(BANDS)]
+
+    def add(self, item_id: str, fp: int):
+        if item_id in self._by_id:
+            self.remove(item_id)
+        self._by_id[item_id] = fp
+        for table, key in zip(self._bands, self._band_keys(fp)):
+            table.setdefault(key, set()).add(item_id)
+
+    def remove(self, item_id: str):
+        fp = self._by_id.pop(item_id, None)
+        if fp is None:
+            return
+        for table, key in zip(self._bands, self._band_keys(fp)):
+            ids = table.get(key)
+            if ids:
+                ids.discard(item_id)
+                if not ids:
+                    del table[key]
+
+    def find(self, fp: int, exclude: str = None) -> Optional[str]:
+        """Возвращает id ближайшего почти-дубля (расстояние <= max_distance) или None"""
+        candidates: Set[str] = set()
+        for table, key in zip(self._bands, self._band_keys(fp)):
+            candidates |= table.get(key, set())
+        candidates.discard(exclude)
+        best, best_dist = None, self.max_distance + 1
+        for cid in candidates:
+            dist = hamming(fp, self._by_id[cid])
+            if dist < best_dist:
+                best, best_dist = cid, dist
+        return best
+
+    def items(self):
+        return self._by_id.items()
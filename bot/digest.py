@@ -0,0 +1,87 @@
+"""Дайджест: несколько новостей в одном сообщении модерации.
+
+Состояние каждой новости хранится в самом сообщении — в footer её embed'а
+("#2 · ожидает", "#2 · ✅ одобрено: Имя"), поэтому переживает перезапуск бота
+и не требует отдельного хранилища. Компоненты (два select'а) обрабатывает
+on_interaction кога по custom_id; View здесь только описывает их разметку.
+"""
+from typing import List
+
+import discord
+
+# Discord принимает не больше 10 embed'ов в одном сообщении
+DIGEST_MAX_ITEMS = 10
+
+CUSTOM_ID_PREFIX = "digest:"
+APPROVE_ID = "digest:approve"
+REJECT_ID = "digest:reject"
+
+PENDING = "pending"
+APPROVED = "approved"
+REJECTED = "rejected"
+
+_MARKS = {APPROVED: "✅ одобрено", REJECTED: "❌ отклонено"}
+_COLORS = {PENDING: discord.Color.blurple(), APPROVED: discord.Color.green(), REJECTED: discord.Color.dark_grey()}
+
+
+def numbered(embed: discord.Embed, index: int) -> discord.Embed:
+    """Embed новости для дайджеста: номер и состояние «ожидает» в footer"""
+    embed = embed.copy()
+    embed.set_footer(text=f"#{index + 1} · ожидает")
+    embed.colour = _COLORS[PENDING]
+    return embed
+
+
+def item_state(embed: discord.Embed) -> str:
+    text = embed.footer.text or ""
+    for state, mark in _MARKS.items():
+        if mark in text:
+            return state
+    return PENDING
+
+
+def mark(embed: discord.Embed, state: str, moderator: str) -> discord.Embed:
+    """Копия embed'а с решением модератора"""
+    index = (embed.footer.text or "#?").split(" ", 1)[0]
+    embed = embed.copy()
+    embed.set_footer(text=f"{index} · {_MARKS[state]}: {moderator}")
+    embed.colour = _COLORS[state]
+    return embed
+
+
+def clean(embed: discord.Embed) -> discord.Embed:
+    """Embed для публикации: без служебного footer"""
+    embed = embed.copy()
+    embed.remove_footer()
+    embed.colour = _COLORS[PENDING]
+    return embed
+
+
+def is_digest(embeds: List[discord.Embed]) -> bool:
+    """Сообщение-дайджест: у каждого его embed'а служебный footer с номером (см. numbered)"""
+    return any(e.footer.text for e in embeds)
+
+
+def pending(embeds: List[discord.Embed]) -> List[int]:
+    return [i for i, e in enumerate(embeds) if item_state(e) == PENDING]
+
+
+def summary(embeds: List[discord.Embed]) -> str:
+    states = [item_state(e) for e in embeds]
+    return (f"📰 Дайджест: {len(embeds)} новостей — ожидают {states.count(PENDING)}, "
+            f"одобрено {states.count(APPROVED)}, отклонено {states.count(REJECTED)}")
+
+
+def build_view(embeds: List[discord.Embed]) -> discord.ui.View:
+    """Select'ы «одобрить»/«отклонить» по ещё не решённым новостям (пустой View убирает компоненты)"""
+    view = discord.ui.View(timeout=None)
+    waiting = pending(embeds)
+    if waiting:
+        for custom_id, placeholder in ((APPROVE_ID, "✅ Одобрить…"), (REJECT_ID, "❌ Отклонить…")):
+            options = [discord.SelectOption(label=f"{i + 1}. {embeds[i].title or 'Новость'}"[:100], value=str(i))
+                       for i in waiting]
+            view.add_item(discord.ui.Select(custom_id=custom_id, placeholder=placeholder,
+                                            min_values=1, max_values=len(options), options=options))
+    # Остановленный View не регистрируется в discord.py — взаимодействия получает только ког
+    view.stop()
+    return view
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from bot.config import config
+
+log = logging.getLogger(__name__)
+
+# Статусы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Больше этого Retry-After не ждём — считаем запрос неудачным
+MAX_RETRY_AFTER_SECONDS = 300.0
+
+
+class CircuitOpenError(Exception):
+    """Хост временно недоступен — запрос отклонён без обращения к сети."""
+
+
+class TokenBucket:
+    """Простой token bucket: rate токенов в секунду, не больше capacity в запасе."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Ждёт свободный токен, возвращает время ожидания в секундах."""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+                waited += delay
+                await asyncio.sleep(delay)
+
+
+class HostGovernor:
+    """Ограничивает исходящие запросы к одному хосту.
+
+    Token bucket на частоту запросов, уважение Retry-After, повторы с джиттером
+    для временных ошибок и circuit breaker, который быстро отказывает, пока хост лежит.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        rate: float = config.HTTP_RATE_PER_SECOND,
+        burst: int = config.HTTP_BURST,
+        max_retries: int = config.HTTP_MAX_RETRIES,
+        timeout: float = config.HTTP_TIMEOUT_SECONDS,
+        failure_threshold: int = config.CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = config.CIRCUIT_RESET_SECONDS,
+    ):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        # Состояние circuit breaker: closed / open / half-open
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        # До этого момента (monotonic) хост просил не беспокоить (Retry-After)
+        self.blocked_until = 0.0
+
+        self.counters: Dict[str, float] = {
+            "requests": 0,
+            "success": 0,
+            "retries": 0,
+            "failures": 0,
+            "throttle_waits": 0,
+            "throttle_wait_seconds": 0.0,
+            "retry_after": 0,
+            "retry_after_seconds": 0.0,
+            "circuit_opened": 0,
+            "short_circuited": 0,
+        }
+
+    # --- circuit breaker ---
+
+    def _before_request(self):
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                self.counters["short_circuited"] += 1
+                raise CircuitOpenError(f"circuit open for {self.host}")
+            self.state = "half-open"
+        if self.state == "half-open":
+            # В полуоткрытом состоянии пропускаем только один пробный запрос
+            if self._probe_in_flight:
+                self.counters["short_circuited"] += 1
+                raise CircuitOpenError(f"circuit half-open for {self.host}, probe in flight")
+            self._probe_in_flight = True
+
+    def _record_success(self):
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        if self.state != "closed":
+            log.info("🟢 Circuit for %s closed again.", self.host)
+        self.state = "closed"
+
+    def _record_failure(self):
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        self.counters["failures"] += 1
+        if self.state == "half-open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.counters["circuit_opened"] += 1
+                log.warning("🔴 Circuit for %s opened after %d failures.", self.host, self.consecutive_failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    # --- ожидания ---
+
+    async def _throttle(self):
+        pause = self.blocked_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        waited = await self.bucket.acquire()
+        if waited > 0:
+            self.counters["throttle_waits"] += 1
+            self.counters["throttle_wait_seconds"] += waited
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter: случайная задержка от 0 до экспоненциального потолка
+        return random.uniform(0, min(30.0, 2 ** attempt))
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Retry-After бывает числом секунд или HTTP-датой."""
+        if not value:
+            return None
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+    # --- запрос ---
+
+    @asynccontextmanager
+    async def open(self, session: aiohttp.ClientSession, url: str, method: str = "GET"):
+        """Запрос (GET, HEAD) с учётом всех ограничений; отдаёт успешный ответ для потокового чтения тела."""
+        self._before_request()
+        try:
+            resp = await self._open_with_retries(session, url, method)
+            try:
+                yield resp
+            finally:
+                resp.release()
+        finally:
+            # Пробный запрос завершился (как угодно) — следующий снова может стать пробным
+            self._probe_in_flight = False
+
+    async def fetch_text(self, session: aiohttp.ClientSession, url: str) -> str:
+        """GET с учётом всех ограничений; возвращает тело ответа как текст."""
+        async with self.open(session, url) as resp:
+            return await resp.text()
+
+    async def _open_with_retries(self, session: aiohttp.ClientSession, url: str, method: str = "GET") -> aiohttp.ClientResponse:
+        attempt = 0
+        while True:
+            await self._throttle()
+            self.counters["requests"] += 1
+            delay = None
+            try:
+                resp = await session.request(method, url, timeout=aiohttp.ClientTimeout(total=self.timeout))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    self._record_failure()
+                    raise
+                log.warning("⚠️ %s: transient error (%r), retry %d/%d", self.host, e, attempt + 1, self.max_retries)
+            else:
+                if resp.status not in RETRY_STATUSES:
+                    # 4xx (кроме 429) — хост жив, повторять бессмысленно
+                    if resp.status < 500:
+                        self._record_success()
+                    else:
+                        self._record_failure()
+                    if resp.status >= 400:
+                        resp.release()
+                        resp.raise_for_status()
+                    self.counters["success"] += 1
+                    return resp
+
+                resp.release()
+                retry_after = self.parse_retry_after(resp.headers.get("Retry-After"))
+                if retry_after is not None:
+                    if retry_after > MAX_RETRY_AFTER_SECONDS:
+                        self._record_failure()
+                        resp.raise_for_status()
+                    self.counters["retry_after"] += 1
+                    self.counters["retry_after_seconds"] += retry_after
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+                    delay = 0.0
+                if attempt >= self.max_retries:
+                    self._record_failure()
+                    resp.raise_for_status()
+
+            self.counters["retries"] += 1
+            await asyncio.sleep(self._backoff(attempt) if delay is None else delay)
+            attempt += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        data = dict(self.counters)
+        data["state"] = self.state
+        return data
+
+
+_governors: Dict[str, HostGovernor] = {}
+
+
+def get_governor(url: str) -> HostGovernor:
+    """Возвращает (создаёт при необходимости) governor для хоста из url."""
+    host = urlsplit(url).netloc.lower()
+    gov = _governors.get(host)
+    if gov is None:
+        gov = HostGovernor(host)
+        _governors[host] = gov
+    return gov
+
+
+def all_governors() -> Dict[str, HostGovernor]:
+    return dict(_governors)
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Set
+
+from discord.ext import commands
+
+from bot.config import config
+
+log = logging.getLogger(__name__)
+
+LEADER_LEASE = "leader"
+# Завершённые блокировки публикаций храним месяц — дольше дубль через реакцию маловероятен
+DONE_LOCK_RETENTION_SECONDS = 30 * 24 * 3600
+
+
+class StandbyError(commands.CheckFailure):
+    """Команда пришла в резервный экземпляр — отвечает ведущий."""
+
+
+class LeaseStore:
+    """Общий для экземпляров бота SQLite-файл: аренда ведущего и блокировки публикаций.
+
+    Каждая операция — короткая транзакция BEGIN IMMEDIATE, поэтому проверка и запись
+    атомарны между процессами. Файл должен лежать на локальном диске (или томе,
+    общем для контейнеров одного хоста): блокировки SQLite на сетевых ФС ненадёжны.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS lease (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS publish_locks (key TEXT PRIMARY KEY, holder TEXT NOT NULL, "
+                         "state TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def _transaction(self, fn):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    # --- аренда ведущего ---
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """Берёт или продлевает аренду; False — её держит другой живой экземпляр"""
+        def run(conn):
+            now = time.time()
+            row = conn.execute("SELECT holder, expires_at FROM lease WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != holder and row[1] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO lease (name, holder, expires_at) VALUES (?, ?, ?)", (name, holder, now + ttl))
+            return True
+        return self._transaction(run)
+
+    def release_lease(self, name: str, holder: str):
+        self._transaction(lambda conn: conn.execute("DELETE FROM lease WHERE name = ? AND holder = ?", (name, holder)))
+
+    # --- блокировки публикаций ---
+
+    def try_lock(self, key: str, holder: str, ttl: float) -> bool:
+        """Захватывает публикацию key. False — уже опубликовано или сейчас публикуется.
+
+        Неистёкшая блокировка 'publishing' держит key для всех, включая сам holder: она не
+        реентерабельна, так что защищает и от повторной публикации в том же экземпляре.
+        Блокировка упавшего экземпляра держится до истечения ttl — публикация могла пройти,
+        а отметка нет, поэтому сразу повторять нельзя (даже перезапущенному с тем же HA_INSTANCE_ID).
+        Снимается явно: finish_lock при успехе, release_lock при ошибке.
+        """
+        def run(conn):
+            now = time.time()
+            row = conn.execute("SELECT state, expires_at FROM publish_locks WHERE key = ?", (key,)).fetchone()
+            if row and (row[0] == "done" or row[1] > now):
+                return False
+            conn.execute("INSERT OR REPLACE INTO publish_locks (key, holder, state, expires_at) VALUES (?, ?, 'publishing', ?)",
+                         (key, holder, now + ttl))
+            return True
+        return self._transaction(run)
+
+    def finish_lock(self, key: str, holder: str):
+        """Публикация прошла: блокировка становится постоянной отметкой"""
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE publish_locks SET state = 'done', expires_at = ? WHERE key = ? AND holder = ?", (time.time(), key, holder)))
+
+    def release_lock(self, key: str, holder: str):
+        """Публикация не удалась: блокировку можно брать снова"""
+        self._transaction(lambda conn: conn.execute(
+            "DELETE FROM publish_locks WHERE key = ? AND holder = ? AND state = 'publishing'", (key, holder)))
+
+    def prune(self, older_than: float):
+        self._transaction(lambda conn: conn.execute(
+            "DELETE FROM publish_locks WHERE state = 'done' AND expires_at < ?", (older_than,)))
+
+
+class HACoordinator:
+    """Ведущий/резервный режим для нескольких экземпляров бота.
+
+    Ведущий — тот, кто держит аренду в общем LeaseStore; он опрашивает источники,
+    обрабатывает реакции и команды. Резервный остаётся подключённым к gateway и каждые
+    HA_RENEW_SECONDS пытается взять аренду — после падения или остановки ведущего
+    он становится ведущим не позже чем через HA_LEASE_SECONDS.
+    При выключенном HA_ENABLED экземпляр всегда ведущий и ничего не пишет на диск.
+    """
+
+    def __init__(self, enabled: bool = config.HA_ENABLED, path: str = config.HA_DB_PATH,
+                 instance_id: Optional[str] = None):
+        self.enabled = enabled
+        self.instance_id = instance_id or config.HA_INSTANCE_ID or \
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.store = LeaseStore(path) if enabled else None
+        # Колбэки смены роли (корутины без аргументов)
+        self.on_promote: List[Callable[[], Awaitable]] = []
+        self.on_demote: List[Callable[[], Awaitable]] = []
+        # Аренда продлена, экземпляр и так ведущий (is_leader мог ненадолго стать False из-за опоздания)
+        self.on_renew: List[Callable[[], Awaitable]] = []
+        # Колбэки идут отдельными задачами: долгий обработчик не должен задерживать продление аренды
+        self._callbacks: Set[asyncio.Task] = set()
+        self._leader = False
+        # До этого момента (monotonic) аренда точно наша, даже если продление запоздало
+        self._valid_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        if not self.enabled:
+            return True
+        return self._leader and time.monotonic() < self._valid_until
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает продление и отдаёт аренду — резервный подхватит сразу"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.enabled and self._leader:
+            self._leader = False
+            try:
+                await asyncio.to_thread(self.store.release_lease, LEADER_LEASE, self.instance_id)
+            except Exception as e:
+                log.warning("Не удалось отдать аренду: %s", e)
+
+    async def _run(self):
+        log.info("HA: экземпляр %s, аренда %s с", self.instance_id, config.HA_LEASE_SECONDS)
+        while True:
+            started = time.monotonic()
+            try:
+                held = await asyncio.to_thread(
+                    self.store.acquire_lease, LEADER_LEASE, self.instance_id, config.HA_LEASE_SECONDS)
+            except Exception as e:
+                # Не смогли подтвердить аренду — безопаснее уступить
+                log.warning("HA: ошибка продления аренды: %s", e)
+                held = False
+            if held:
+                self._valid_until = started + config.HA_LEASE_SECONDS
+            if held and not self._leader:
+                self._leader = True
+                log.info("HA: %s стал ведущим.", self.instance_id)
+                self._spawn(self.on_promote)
+            elif held:
+                self._spawn(self.on_renew)
+            elif self._leader:
+                self._leader = False
+                log.warning("HA: %s потерял аренду и перешёл в резерв.", self.instance_id)
+                self._spawn(self.on_demote)
+            await asyncio.sleep(config.HA_RENEW_SECONDS)
+
+    def _spawn(self, callbacks):
+        if not callbacks:
+            return
+        task = asyncio.create_task(self._notify(callbacks))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    async def _notify(self, callbacks):
+        for callback in list(callbacks):
+            try:
+                await callback()
+            except Exception:
+                log.exception("HA: ошибка в обработчике смены роли")
+
+    # --- блокировки публикаций ---
+
+    async def acquire_publish(self, key: str) -> bool:
+        """True — этот экземпляр может публиковать key. При ошибке хранилища — False: лучше не опубликовать, чем задвоить."""
+        if not self.enabled:
+            return True
+        try:
+            return await asyncio.to_thread(self.store.try_lock, key, self.instance_id, config.PUBLISH_LOCK_SECONDS)
+        except Exception:
+            log.exception("HA: не удалось взять блокировку публикации %s", key)
+            return False
+
+    async def finish_publish(self, key: str):
+        if self.enabled:
+            try:
+                await asyncio.to_thread(self.store.finish_lock, key, self.instance_id)
+            except Exception as e:
+                log.warning("HA: не удалось отметить публикацию %s: %s", key, e)
+
+    async def release_publish(self, key: str):
+        if self.enabled:
+            try:
+                await asyncio.to_thread(self.store.release_lock, key, self.instance_id)
+            except Exception as e:
+                log.warning("HA: не удалось снять блокировку публикации %s: %s", key, e)
+
+    async def prune(self):
+        if self.enabled:
+            await asyncio.to_thread(self.store.prune, time.time() - DONE_LOCK_RETENTION_SECONDS)
+
+
+ha = HACoordinator()
@@ -0,0 +1,238 @@
+"""Картинки новостей: проверенный URL вместо угаданного.
+
+Источник перечисляет кандидатов в порядке предпочтения (у MAL — полноразмерная
+картинка, затем превью из списка). Резолвер проверяет их HEAD-запросами через
+governor хоста — записи тика параллельно — и запоминает результат по исходному URL
+в файле-кеше на IMAGE_CACHE_TTL_HOURS, так что повторные тики и перезапуски сеть не трогают.
+
+С IMAGE_REHOST картинка скачивается, ужимается (если установлен Pillow) и уходит
+вложением: item['image'] = 'attachment://<файл>', сами файлы лежат в IMAGE_DIR.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+import discord
+
+from bot.config import config
+from bot.governor import get_governor
+from bot.metrics import cache_lookup, stage
+
+log = logging.getLogger(__name__)
+
+ATTACHMENT_PREFIX = "attachment://"
+# Неудачная проверка живёт недолго — картинка могла просто ещё не появиться на CDN
+NEGATIVE_TTL_SECONDS = 3600
+# Больше не скачиваем; вложение Discord для бота — до 10 МБ, оставляем запас
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+MAX_ATTACHMENT_BYTES = 8 * 1024 * 1024
+_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+
+
+def _compact(data: bytes, content_type: str, max_side: int) -> Tuple[bytes, str]:
+    """Уменьшает картинку до max_side по большей стороне и пережимает в JPEG; без Pillow — как есть"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return data, content_type
+    with Image.open(io.BytesIO(data)) as img:
+        if getattr(img, "is_animated", False):
+            return data, content_type
+        img.thumbnail((max_side, max_side))
+        out = io.BytesIO()
+        img.convert("RGB").save(out, "JPEG", quality=85, optimize=True)
+    if out.tell() >= len(data) and content_type in _EXTENSIONS:
+        return data, content_type
+    return out.getvalue(), "image/jpeg"
+
+
+class ImageResolver:
+    """Кеш проверенных картинок: исходный URL -> {'url', 'file', 'checked_at'}.
+
+    'url' — первый рабочий кандидат (None — все ответили 404/410 или не картинкой, такая запись
+    живёт NEGATIVE_TTL_SECONDS; сетевые сбои и 5xx в кеш не попадают),
+    'file' — имя перезалитого файла в image_dir. Файл кеша читается при первом обращении.
+    """
+
+    def __init__(self, path: Path = Path(config.IMAGE_CACHE_PATH), image_dir: Path = Path(config.IMAGE_DIR),
+                 ttl: float = config.IMAGE_CACHE_TTL_HOURS * 3600, rehost: bool = config.IMAGE_REHOST):
+        self.path = Path(path)
+        self.image_dir = Path(image_dir)
+        self.ttl = ttl
+        self.rehost = rehost
+        self._entries: Dict[str, Dict] = {}
+        self._loaded = False
+        self._dirty = False
+
+    def _load(self):
+        self._loaded = True
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning("Не удалось прочитать кеш картинок %s: %s", self.path, e)
+
+    def _fresh(self, entry: Dict, now: float) -> bool:
+        ttl = self.ttl if entry.get('url') else NEGATIVE_TTL_SECONDS
+        if now - entry.get('checked_at', 0) >= ttl:
+            return False
+        # Перезалитый файл удалили с диска — проверяем заново
+        return not entry.get('file') or (self.image_dir / entry['file']).exists()
+
+    @staticmethod
+    def _embed_url(entry: Dict) -> Optional[str]:
+        return ATTACHMENT_PREFIX + entry['file'] if entry.get('file') else entry.get('url')
+
+    async def resolve(self, session: aiohttp.ClientSession, source_url: str, candidates: List[str]) -> Optional[str]:
+        """URL картинки для embed (или attachment://...); None — ни один кандидат не отвечает картинкой.
+
+        Если часть кандидатов не проверилась (таймаут, DNS, 5xx, открытый circuit), а остальные точно
+        не годятся, запись в кеш не пишется и возвращается исходный URL — проверим на следующем тике.
+        """
+        if not self._loaded:
+            self._load()
+        now = time.time()
+        entry = self._entries.get(source_url)
+        if entry and self._fresh(entry, now):
+            cache_lookup("image", True)
+            return self._embed_url(entry)
+        cache_lookup("image", False)
+
+        url, unknown = None, False
+        for candidate in candidates:
+            result = await self._probe(session, candidate)
+            if result:
+                url = candidate
+                break
+            unknown = unknown or result is None
+        if url is None and unknown:
+            log.info("Картинку для %s проверить не удалось, оставляем исходную ссылку", source_url)
+            return source_url
+        if url is None:
+            log.info("Нет рабочей картинки для %s (проверено: %d)", source_url, len(candidates))
+        entry = {'url': url, 'file': None, 'checked_at': now}
+        if url and self.rehost:
+            entry['file'] = await self._rehost(session, source_url, url)
+        self._entries[source_url] = entry
+        self._dirty = True
+        return self._embed_url(entry)
+
+    async def resolve_items(self, session: aiohttp.ClientSession, items: List[Dict],
+                            candidates: Callable[[str], List[str]]):
+        """Заменяет item['image'] проверенным URL; записи проверяются параллельно, кеш пишется один раз"""
+        items = [item for item in items if item.get('image')]
+        if not items:
+            return
+        with stage("image_resolve"):
+            urls = await asyncio.gather(*(self.resolve(session, item['image'], candidates(item['image']))
+                                          for item in items))
+        for item, url in zip(items, urls):
+            item['image'] = url
+        if self._dirty:
+            self._dirty = False
+            self._prune()
+            payload = json.dumps(self._entries, ensure_ascii=False)
+            try:
+                await asyncio.to_thread(self._write, payload)
+            except Exception as e:
+                log.warning("Не удалось сохранить кеш картинок: %s", e)
+
+    async def _probe(self, session: aiohttp.ClientSession, url: str) -> Optional[bool]:
+        """HEAD-проверка кандидата: True — ответ 2xx с Content-Type image/*, False — точно нет
+        (404/410 или не картинка), None — ответа нет (таймаут, DNS, 5xx, открытый circuit)"""
+        governor = get_governor(url)
+        try:
+            try:
+                async with governor.open(session, url, "HEAD") as resp:
+                    content_type = resp.content_type
+            except aiohttp.ClientResponseError as e:
+                if e.status not in (405, 501):
+                    raise
+                # Сервер не поддерживает HEAD — смотрим заголовки GET, тело не читаем
+                async with governor.open(session, url) as resp:
+                    content_type = resp.content_type
+        except aiohttp.ClientResponseError as e:
+            log.debug("Картинка %s недоступна: %r", url, e)
+            return False if e.status in (404, 410) else None
+        except Exception as e:
+            log.debug("Картинка %s не проверена: %r", url, e)
+            return None
+        if not content_type.startswith("image/"):
+            log.debug("По адресу %s не картинка: %s", url, content_type)
+            return False
+        return True
+
+    async def _rehost(self, session: aiohttp.ClientSession, source_url: str, url: str) -> Optional[str]:
+        """Скачивает и ужимает картинку в image_dir; None — оставить ссылку"""
+        try:
+            async with get_governor(url).open(session, url) as resp:
+                if (resp.content_length or 0) > MAX_DOWNLOAD_BYTES:
+                    return None
+                content_type = resp.content_type
+                chunks, size = [], 0
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    size += len(chunk)
+                    if size > MAX_DOWNLOAD_BYTES:
+                        return None
+                    chunks.append(chunk)
+            data, content_type = await asyncio.to_thread(
+                _compact, b"".join(chunks), content_type, config.IMAGE_REHOST_MAX_SIDE)
+        except Exception as e:
+            log.warning("Не удалось перезалить картинку %s: %s", url, e)
+            return None
+        if len(data) > MAX_ATTACHMENT_BYTES:
+            return None
+        name = hashlib.sha1(source_url.encode("utf-8")).hexdigest()[:16] + _EXTENSIONS.get(content_type, ".jpg")
+        await asyncio.to_thread(self._write_file, name, data)
+        return name
+
+    def _write_file(self, name: str, data: bytes):
+        self.image_dir.mkdir(parents=True, exist_ok=True)
+        (self.image_dir / name).write_bytes(data)
+
+    def _prune(self):
+        """Удаляет просроченные записи вместе с их файлами"""
+        now = time.time()
+        horizon = max(self.ttl, NEGATIVE_TTL_SECONDS)
+        for key in [k for k, e in self._entries.items() if now - e.get('checked_at', 0) >= horizon]:
+            name = self._entries.pop(key).get('file')
+            if name:
+                (self.image_dir / name).unlink(missing_ok=True)
+
+    def _write(self, payload: str):
+        # Через временный файл и os.replace, как storage
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(payload, encoding='utf-8')
+        os.replace(tmp, self.path)
+
+    def attachments(self, embeds: List[discord.Embed]) -> List[discord.File]:
+        """Файлы для embed'ов с перезалитой картинкой; пропавший файл — embed остаётся без картинки.
+
+        discord.File одноразовый: вызывать заново для каждой отправки.
+        """
+        files: Dict[str, discord.File] = {}
+        for embed in embeds:
+            url = embed.image.url
+            if not url or not url.startswith(ATTACHMENT_PREFIX):
+                continue
+            name = url[len(ATTACHMENT_PREFIX):]
+            path = self.image_dir / name
+            if not path.exists():
+                embed.set_image(url=None)
+            elif name not in files:
+                files[name] = discord.File(path, filename=name)
+        return list(files.values())
+
+
+# глобальный экземпляр
+resolver = ImageResolver()
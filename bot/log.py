@@ -0,0 +1,156 @@
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+from bot.config import config
+
+# Идентификаторы корреляции: тик источника / обработка реакции и id новости.
+# contextvars копируются в задачи asyncio при создании, поэтому доходят и до рассылки по серверам.
+tick_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("tick_id", default=None)
+news_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("news_id", default=None)
+_tick_counter = itertools.count(1)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def new_tick_id(prefix: str) -> str:
+    return f"{prefix}-{next(_tick_counter)}"
+
+
+@contextmanager
+def correlation(tick: Optional[str] = None, news: Optional[str] = None):
+    """Проставляет tick/news во все записи лога внутри блока"""
+    tokens = []
+    if tick is not None:
+        tokens.append((tick_id, tick_id.set(tick)))
+    if news is not None:
+        tokens.append((news_id, news_id.set(news)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.tick = tick_id.get()
+        record.news = news_id.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Не больше burst записей с одинаковым шаблоном за window секунд.
+
+    Ключ — шаблон сообщения (record.msg до подстановки аргументов), поэтому одинаковые
+    строки про разные сообщения считаются вместе. Отброшенные записи подсчитываются,
+    и первая запись следующего окна несёт поле suppressed. Ошибки не ограничиваются.
+    """
+
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._state = {}  # (logger, шаблон) -> [начало окна, записей, отброшено]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        state = self._state.get(key)
+        if state is None or now - state[0] >= self.window:
+            if state and state[2]:
+                record.suppressed = state[2]
+            self._state[key] = [now, 1, 0]
+            return True
+        state[1] += 1
+        if state[1] <= self.burst:
+            return True
+        state[2] += 1
+        return False
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке.
+
+    Стандартный prepare() подставляет аргументы и форматирует запись сразу, то есть
+    на event loop. Здесь запись уходит в очередь как есть, а всё форматирование и
+    запись в stdout делает поток QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    """Одна строка на запись: key=value (text) или JSON"""
+
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in ("tick", "news", "suppressed"):
+            value = getattr(record, key, None)
+            if value is not None:
+                fields[key] = value
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+
+        if self.json:
+            return json.dumps(fields, ensure_ascii=False, default=str)
+        extra = " ".join(f"{k}={fields[k]}" for k in ("tick", "news", "suppressed") if k in fields)
+        line = f"{fields['ts']} {fields['level']:<7} {fields['logger']}: {fields['msg']}"
+        if extra:
+            line += f" [{extra}]"
+        if "exc" in fields:
+            line += "\n" + fields["exc"]
+        return line
+
+
+def setup_logging():
+    """Настраивает корневой логгер: очередь + фоновый поток, который пишет в stdout"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = LazyQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(RateLimitFilter(config.LOG_RATE_LIMIT_BURST, config.LOG_RATE_LIMIT_WINDOW))
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(StructuredFormatter(config.LOG_FORMAT))
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(config.LOG_LEVEL)
+    # discord.py очень разговорчив на DEBUG — держим его не ниже INFO
+    logging.getLogger("discord").setLevel(max(logging.INFO, logging.getLevelName(config.LOG_LEVEL)))
+
+
+def stop_logging():
+    """Дописывает очередь и останавливает фоновый поток"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
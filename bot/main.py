@@ -1,28 +1,100 @@
 import discord
 from discord.ext import commands
 import asyncio
+import logging
+import time
 from bot.config import config
+from bot import metrics
+from bot.ha import ha
+from bot.log import setup_logging
+from bot.startup import startup
+from bot.watchdog import watchdog
 
+log = logging.getLogger(__name__)
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.reactions = True
-intents.members = True
-intents.messages = True
 
+def build_intents() -> discord.Intents:
+    if config.LEAN_GATEWAY:
+        # Минимум для работы: каналы/роли серверов и сырые события реакций.
+        # Команды в этом режиме работают как slash-команды, message_content не нужен.
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_reactions = True
+        return intents
+
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.reactions = True
+    intents.members = True
+    intents.messages = True
+    return intents
+
+
+def build_bot() -> commands.Bot:
+    options = {}
+    if config.LEAN_GATEWAY:
+        # Не скачиваем участников серверов и не кешируем их: модератор приходит в payload.member реакции
+        options.update(
+            chunk_guilds_at_startup=False,
+            member_cache_flags=discord.MemberCacheFlags.none(),
+        )
+    return commands.Bot(
+        command_prefix="!",
+        intents=build_intents(),
+        max_messages=config.MAX_MESSAGES or None,
+        **options,
+    )
+
+
+bot = build_bot()
+metrics.instrument_http(bot.http)
 
-bot = commands.Bot(command_prefix="!", intents=intents)
 
 @bot.event
 async def on_ready():
-    print(f"✅ Logged in as {bot.user} (ID: {bot.user.id})")
+    log.info("✅ Logged in as %s (ID: %s)", bot.user, bot.user.id)
+    # Отчёт о запуске — только при первом on_ready (дальше это переподключения)
+    if not startup.reported:
+        startup.reported = True
+        startup.mark("time_to_ready", startup.since_start())
+        mode = "lean" if config.LEAN_GATEWAY else "full"
+        log.info("⏱️ Startup (gateway mode=%s): %s", mode, startup.summary())
 
 async def _load_cogs():
     await bot.load_extension("bot.cogs.moderation")
 
+async def _sync_app_commands():
+    if config.SYNC_APP_COMMANDS:
+        synced = await bot.tree.sync()
+        log.info("🔁 Synced %d app commands.", len(synced))
+
+def _load_storage():
+    from bot.storage import storage
+    started = time.perf_counter()
+    storage.load()
+    startup.mark("storage_load", time.perf_counter() - started)
+
 def run_bot():
+    setup_logging()
+
     async def _start():
-        await _load_cogs()
-        await bot.start(config.TOKEN)
+        async with bot:
+            watchdog.start()
+            # processed.json читается в отдельном потоке, пока идёт логин и подключение к gateway
+            storage_task = asyncio.create_task(asyncio.to_thread(_load_storage))
+            with startup.stage("cog_load"):
+                await _load_cogs()
+            # после загрузки кога: он подписан на смену роли ведущего
+            ha.start()
+            with startup.stage("login"):
+                await bot.login(config.TOKEN)
+            await _sync_app_commands()
+            await metrics.start_server()
+            try:
+                await bot.connect()
+            finally:
+                # отдаём аренду сразу — резервный экземпляр не ждёт её истечения
+                await ha.stop()
+            await storage_task
 
     asyncio.run(_start())
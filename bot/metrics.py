@@ -0,0 +1,228 @@
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from bot.config import config
+
+log = logging.getLogger(__name__)
+
+# Границы корзин гистограмм по умолчанию, секунды
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Монотонный счётчик с метками. inc() — одна операция над словарём, без блокировок."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(tuple(str(labels.get(n, "")) for n in self.labels), 0)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in sorted(self.values.items())]
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (формат Prometheus: _bucket/_sum/_count)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # метки -> [счётчики по корзинам..., сумма, количество]
+        self.values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        data = self.values.get(key)
+        if data is None:
+            data = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+        idx = bisect.bisect_left(self.buckets, value)
+        if idx < len(self.buckets):
+            data[idx] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self, **labels) -> Tuple[int, float]:
+        """(количество, сумма) для набора меток"""
+        data = self.values.get(tuple(str(labels.get(n, "")) for n in self.labels))
+        return (data[-1], data[-2]) if data else (0, 0.0)
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, data in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                labels = _format_labels(self.labels, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {data[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {data[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {data[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+        # Функции, отдающие готовые строки (например, счётчики governor'ов)
+        self.collectors: List[Callable[[], Iterable[str]]] = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "senku_stage_seconds", "Duration of pipeline stages", ("stage",))
+STAGE_ERRORS = registry.counter(
+    "senku_stage_errors_total", "Pipeline stage failures", ("stage",))
+CACHE_REQUESTS = registry.counter(
+    "senku_cache_requests_total", "Cache lookups by result (hit/miss)", ("cache", "result"))
+NEWS_ITEMS = registry.counter(
+    "senku_news_items_total", "News items by outcome", ("source", "outcome"))
+REST_REQUESTS = registry.counter(
+    "senku_discord_rest_requests_total", "Discord REST calls by route", ("route", "outcome"))
+REST_SECONDS = registry.histogram(
+    "senku_discord_rest_seconds", "Discord REST call latency by route", ("route",))
+REACTION_HANDLER_SECONDS = registry.histogram(
+    "senku_reaction_handler_seconds", "on_raw_reaction_add handler latency")
+
+
+@contextmanager
+def stage(name: str):
+    """Замер стадии конвейера: время в STAGE_SECONDS, исключения — в STAGE_ERRORS"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+
+
+async def timed(name: str, awaitable):
+    """await с замером стадии: msg = await timed("discord_send", channel.send(...))"""
+    with stage(name):
+        return await awaitable
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def cache_hit_ratio(cache: str) -> Optional[float]:
+    hits, misses = CACHE_REQUESTS.get(cache=cache, result="hit"), CACHE_REQUESTS.get(cache=cache, result="miss")
+    return hits / (hits + misses) if hits + misses else None
+
+
+def _governor_lines() -> Iterable[str]:
+    from bot.governor import all_governors
+    governors = all_governors()
+    if not governors:
+        return
+    yield "# HELP senku_http_governor Outbound HTTP governor counters per host"
+    yield "# TYPE senku_http_governor gauge"
+    for host, gov in sorted(governors.items()):
+        for key, value in gov.counters.items():
+            yield f"senku_http_governor{_format_labels(('host', 'counter'), (host, key))} {value}"
+        yield f"senku_http_governor{_format_labels(('host', 'counter'), (host, 'circuit_open'))} {int(gov.state != 'closed')}"
+
+
+registry.collectors.append(_governor_lines)
+
+
+def instrument_http(http) -> None:
+    """Оборачивает discord.py HTTPClient.request: счётчик и задержка каждого REST-вызова по route"""
+    original = http.request
+
+    async def request(route, **kwargs):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await original(route, **kwargs)
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            REST_REQUESTS.inc(route=route.key, outcome=outcome)
+            REST_SECONDS.observe(time.perf_counter() - started, route=route.key)
+
+    http.request = request
+
+
+async def start_server(host: str = None, port: int = None):
+    """Поднимает /metrics на локальном порту. Возвращает AppRunner (или None, если выключено)."""
+    port = config.METRICS_PORT if port is None else port
+    if not port:
+        return None
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host or config.METRICS_HOST, port).start()
+    log.info("📈 Metrics endpoint on http://%s:%s/metrics", host or config.METRICS_HOST, port)
+    return runner
@@ -1,156 +1,164 @@
+import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
-from typing import List, Dict
-from deep_translator import GoogleTranslator
+import logging
+from typing import List, Dict, Callable, Optional
 import re
+import html as html_lib
+import xml.etree.ElementTree as ET
+from bot.governor import get_governor
+from bot.metrics import stage
 
-MAL_NEWS_URL = 'https://myanimelist.net/news'
+log = logging.getLogger(__name__)
 
 
-def fix_image_url(url: str) -> str:
-    """Исправляет уменьшенные картинки MAL до оригинального размера"""
-    if not url:
-        return url
-    # Пример: /r/100x156/s/common/... -> /s/common/...
-    if "/r/" in url and "/s/" in url:
-        start = url.find("/r/")
-        end = url.find("/s/")
-        fixed = url[:start] + url[end:]
-        return fixed
-    return url
+def _google_translate(text: str) -> str:
+    # импорт тянет requests — откладываем до первого перевода
+    from deep_translator import GoogleTranslator
+    return GoogleTranslator(source="auto", target="ru").translate(text)
+
+
+# Функция перевода; бенчмарки подменяют её фейковой, чтобы не ходить в Google
+translator = _google_translate
 
 
 def translate_to_ru(text: str) -> str:
     """Переводит текст на русский с помощью Google Translator"""
     try:
-        return GoogleTranslator(source="auto", target="ru").translate(text)
+        with stage("translate"):
+            return translator(text)
     except Exception as e:
-        print("Translation failed:", e)
+        log.warning("Translation failed: %s", e)
         return text
 
 
 async def fetch_page(session: aiohttp.ClientSession, url: str) -> str:
-    async with session.get(url, timeout=15) as resp:
-        resp.raise_for_status()
-        return await resp.text()
+    """Загружает страницу через governor хоста (rate limit, повторы, circuit breaker)"""
+    return await get_governor(url).fetch_text(session, url)
+
+
+def _local(tag: str) -> str:
+    """Имя тега без namespace: '{http://...}thumbnail' -> 'thumbnail'"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _strip_tags(text: str) -> str:
+    text = re.sub(r'<[^>]+>', ' ', html_lib.unescape(text or ''))
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _feed_entry(elem: ET.Element) -> Dict:
+    """Достаёт поля из <item> (RSS) или <entry> (Atom)"""
+    entry = {'title': '', 'link': '', 'image': None, 'excerpt': ''}
+    for child in elem:
+        name = _local(child.tag)
+        if name == 'title':
+            entry['title'] = (child.text or '').strip()
+        elif name == 'link':
+            # RSS: <link>url</link>, Atom: <link href="url" rel="alternate"/>
+            href = child.get('href')
+            if href and child.get('rel', 'alternate') == 'alternate':
+                entry['link'] = href.strip()
+            elif child.text and not entry['link']:
+                entry['link'] = child.text.strip()
+        elif name in ('thumbnail', 'content', 'enclosure') and child.get('url'):
+            # media:thumbnail / media:content / enclosure с картинкой
+            if not entry['image'] and (name != 'enclosure' or (child.get('type') or '').startswith('image')):
+                entry['image'] = child.get('url')
+        elif name in ('description', 'summary', 'content') and not entry['excerpt']:
+            entry['excerpt'] = _strip_tags(child.text)
+    return entry
+
+
+async def fetch_feed_entries(session: aiohttp.ClientSession, url: str, limit: int) -> List[Dict]:
+    """Потоково читает RSS/Atom и возвращает первые limit записей.
+
+    XML разбирается по кускам по мере загрузки (XMLPullParser), поэтому
+    чтение прекращается, как только набрано limit записей.
+    """
+    entries: List[Dict] = []
+    parser = ET.XMLPullParser(events=('end',))
+    async with get_governor(url).open(session, url) as resp:
+        async for chunk in resp.content.iter_chunked(16 * 1024):
+            parser.feed(chunk)
+            for _, elem in parser.read_events():
+                if _local(elem.tag) not in ('item', 'entry'):
+                    continue
+                entry = _feed_entry(elem)
+                elem.clear()
+                if entry['link']:
+                    entries.append(entry)
+                if len(entries) >= limit:
+                    return entries
+    parser.close()
+    return entries
 
 
 async def fetch_full_text(session: aiohttp.ClientSession, url: str) -> str:
     """Загружает полный текст новости с отдельной страницы"""
+    from bs4 import BeautifulSoup
     try:
-        html = await fetch_page(session, url)
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Популярные селекторы, где MAL хранит текст новости
-        selectors = [
-            '.content-news',
-            '.news-container',
-            '.news-container__content',
-            '.text-readability',
-            '.content',
-            '.news-body',
-            '.news-text',
-            '.article-body',
-            '#content',
-            '.js-article-body',
-            '.entry-content',
-        ]
-
-        content = None
-        for sel in selectors:
-            content = soup.select_one(sel)
-            if content:
-                break
-
-        if not content:
-            # последний шанс — контейнер с основным содержимым
-            content = soup.find('article') or soup.find('div', {'class': 'news'})
-
-        if not content:
-            print("⚠️ No content found for:", url)
-            return ""
-
-        # Собираем текст из всех <p> внутри найденного блока
-        paragraphs = [p.get_text(" ", strip=True) for p in content.find_all('p') if p.get_text(strip=True)]
-
-        # Если есть параграфы, возвращаем только первый (короткое описание)
-        if paragraphs:
-            first_para = paragraphs[0].strip()
-            # если есть дополнительные параграфы — добавим многоточие для обозначения обрезки
-            if len(paragraphs) > 1:
-                return first_para + "\n\n..."
-            return first_para
-
-        # Если нет параграфов — собираем все текстовые фрагменты и возвращаем первую логическую часть
-        full_text = " ".join(list(content.stripped_strings))
-        if '\n\n' in full_text:
-            return full_text.split('\n\n', 1)[0].strip()
-        # разбиваем по предложениям в крайнем случае
-        sentences = re.split(r'(?<=[.!?])\s+', full_text)
-        return sentences[0].strip() if sentences else full_text.strip()
-
+        with stage("article_fetch"):
+            html = await fetch_page(session, url)
+        with stage("html_parse"):
+            # разбор страницы — в потоке, чтобы не держать event loop
+            return await asyncio.to_thread(lambda: _extract_first_paragraph(BeautifulSoup(html, 'html.parser'), url))
     except Exception as e:
-        print("Error fetching full text:", e)
+        log.warning("Error fetching full text for %s: %s", url, e)
         return ""
 
 
-async def parse_latest_news(limit: int = 5) -> List[Dict]:
-    """Парсит последние новости с MyAnimeList"""
-    results = []
-    print(f"🔍 Fetching {limit} latest news from MyAnimeList...")
-    async with aiohttp.ClientSession() as session:
-        html = await fetch_page(session, MAL_NEWS_URL)
-        soup = BeautifulSoup(html, 'html.parser')
-        news_units = soup.select('.news-unit')
-
-        for unit in news_units[:limit]:
-            a = unit.select_one('p.title a')
-            if not a:
-                continue
-
-            title = a.text.strip()
-            link = a['href']
-
-            # 🎯 Извлекаем оригинальное название аниме в одинарных кавычках
-            match = re.search(r"'([^']+)'", title)
-            anime_name = match.group(1) if match else None
-
-            # Если нашли название в кавычках — используем только его, иначе переводим заголовок
-            if anime_name:
-                title = f"『{anime_name}』"
-            else:
-                title = translate_to_ru(title)
-
-            # безопасно получаем изображение
-            img = None
-            img_tag = unit.select_one('img')
-            if img_tag:
-                img = img_tag.get('data-src') or img_tag.get('src')
-                img = fix_image_url(img)
-
-            # текст новости — пробуем вытянуть полный текст со страницы
-            excerpt_tag = unit.select_one('.text')
-            excerpt = excerpt_tag.text.strip() if excerpt_tag else ''
-            full_text = await fetch_full_text(session, link)
-            excerpt = full_text or excerpt  # если получилось достать — используем полный текст
-
-            results.append({
-                'id': link,
-                'title': title,
-                'link': link,
-                'image': img,
-                'excerpt': excerpt,
-            })
-
-    # переводим на русский
-    translated_results = []
-    for item in results:
-        if isinstance(item, dict):
-            if item.get("title"):
-                item["title"] = item["title"]
-            if item.get("excerpt"):
-                item["excerpt"] = translate_to_ru(item["excerpt"])
-            translated_results.append(item)
-
-    print(f"✅ Parsed {len(results)} news items successfully.")
-    return translated_results
\ No newline at end of file
+def _extract_first_paragraph(soup, url: str) -> str:
+    """Достаёт первый абзац новости из разобранной страницы статьи"""
+    # Популярные селекторы, где MAL хранит текст новости
+    selectors = [
+        '.content-news',
+        '.news-container',
+        '.news-container__content',
+        '.text-readability',
+        '.content',
+        '.news-body',
+        '.news-text',
+        '.article-body',
+        '#content',
+        '.js-article-body',
+        '.entry-content',
+    ]
+
+    content = None
+    for sel in selectors:
+        content = soup.select_one(sel)
+        if content:
+            break
+
+    if not content:
+        # последний шанс — контейнер с основным содержимым
+        content = soup.find('article') or soup.find('div', {'class': 'news'})
+
+    if not content:
+        log.warning("⚠️ No content found for: %s", url)
+        return ""
+
+    # Собираем текст из всех <p> внутри найденного блока
+    paragraphs = [p.get_text(" ", strip=True) for p in content.find_all('p') if p.get_text(strip=True)]
+
+    # Если есть параграфы, возвращаем только первый (короткое описание)
+    if paragraphs:
+        first_para = paragraphs[0].strip()
+        # если есть дополнительные параграфы — добавим многоточие для обозначения обрезки
+        if len(paragraphs) > 1:
+            return first_para + "\n\n..."
+        return first_para
+
+    # Если нет параграфов — собираем все текстовые фрагменты и возвращаем первую логическую часть
+    full_text = " ".join(list(content.stripped_strings))
+    if '\n\n' in full_text:
+        return full_text.split('\n\n', 1)[0].strip()
+    # разбиваем по предложениям в крайнем случае
+    sentences = re.split(r'(?<=[.!?])\s+', full_text)
+    return sentences[0].strip() if sentences else full_text.strip()
+
+
+async def parse_latest_news(limit: int = 5, is_known: Optional[Callable[[str], bool]] = None) -> List[Dict]:
+    """Парсит последние новости с MyAnimeList (обёртка над источником "mal")"""
+    from bot.sources.mal import MALSource
+    return await MALSource().poll(limit=limit, is_known=is_known)
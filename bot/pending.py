@@ -0,0 +1,164 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+from bot.config import config
+
+PENDING = "pending"
+APPROVED = "approved"
+REJECTED = "rejected"
+
+# Решённые записи старше этого удаляются при открытии базы
+DECIDED_RETENTION_SECONDS = 30 * 24 * 3600
+
+
+@dataclass
+class PendingItem:
+    """Новость, ожидающая решения модератора на конкретном сервере"""
+    id: int
+    guild_id: int
+    news_id: str
+    title: str
+    channel_id: int
+    message_id: int
+    embed: dict
+    created_at: float
+
+
+class PendingStore:
+    """Очередь модерации в SQLite.
+
+    Каждая новость, отправленная в канал модерации, получает короткий числовой id
+    (его называют в !approve / !reject). Выборки идут по индексу (guild_id, state, created_at),
+    поэтому узнать, что ещё ждёт решения, можно без чтения истории канала.
+    Файл открывается при первом обращении. Запросы идут в потоке (asyncio.to_thread),
+    как у LeaseStore в bot/ha.py: коммиты SQLite не держат event loop.
+    """
+
+    def __init__(self, path: Path = Path(config.PENDING_DB_PATH)):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS pending (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    guild_id INTEGER NOT NULL,
+                    news_id TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    channel_id INTEGER NOT NULL,
+                    message_id INTEGER NOT NULL,
+                    embed TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    created_at REAL NOT NULL,
+                    decided_by TEXT,
+                    decided_at REAL,
+                    UNIQUE (guild_id, news_id)
+                );
+                CREATE INDEX IF NOT EXISTS pending_by_state ON pending (guild_id, state, created_at);
+            """)
+            conn.execute("DELETE FROM pending WHERE state != 'pending' AND decided_at < ?",
+                         (time.time() - DECIDED_RETENTION_SECONDS,))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _query_sync(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _write_sync(self, sql: str, params: tuple = ()) -> int:
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(sql, params)
+            conn.commit()
+            return cursor.rowcount
+
+    async def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return await asyncio.to_thread(self._query_sync, sql, params)
+
+    async def _write(self, sql: str, params: tuple = ()) -> int:
+        """Выполняет запрос с коммитом; возвращает число изменённых строк"""
+        return await asyncio.to_thread(self._write_sync, sql, params)
+
+    @staticmethod
+    def _item(row: tuple) -> PendingItem:
+        return PendingItem(id=row[0], guild_id=row[1], news_id=row[2], title=row[3], channel_id=row[4],
+                           message_id=row[5], embed=json.loads(row[6]), created_at=row[7])
+
+    _COLUMNS = "id, guild_id, news_id, title, channel_id, message_id, embed, created_at"
+
+    async def add(self, guild_id: int, news_id: str, title: str, channel_id: int, message_id: int, embed: dict,
+                  created_at: Optional[float] = None) -> int:
+        """Ставит новость в очередь сервера; повторная постановка той же новости ничего не меняет"""
+        await self._write(
+            "INSERT OR IGNORE INTO pending (guild_id, news_id, title, channel_id, message_id, embed, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (guild_id, news_id, title, channel_id, message_id, json.dumps(embed, ensure_ascii=False),
+             created_at or time.time()))
+        rows = await self._query("SELECT id FROM pending WHERE guild_id = ? AND news_id = ?", (guild_id, news_id))
+        return rows[0][0]
+
+    async def list_pending(self, guild_id: int, limit: int = -1) -> List[PendingItem]:
+        """Ожидающие решения новости сервера, старые первыми"""
+        rows = await self._query(f"SELECT {self._COLUMNS} FROM pending WHERE guild_id = ? AND state = 'pending' "
+                                 "ORDER BY created_at LIMIT ?", (guild_id, limit))
+        return [self._item(r) for r in rows]
+
+    async def count_pending(self, guild_id: int) -> int:
+        rows = await self._query("SELECT COUNT(*) FROM pending WHERE guild_id = ? AND state = 'pending'", (guild_id,))
+        return rows[0][0]
+
+    async def get_pending(self, guild_id: int, ids: Iterable[int]) -> List[PendingItem]:
+        ids = list(ids)
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        rows = await self._query(f"SELECT {self._COLUMNS} FROM pending WHERE guild_id = ? AND state = 'pending' "
+                                 f"AND id IN ({marks}) ORDER BY created_at", (guild_id, *ids))
+        return [self._item(r) for r in rows]
+
+    async def undecided(self, guild_id: int, news_ids: Iterable[str]) -> Set[str]:
+        """Из news_ids — те, что стоят в очереди сервера и ещё ждут решения"""
+        news_ids = list(news_ids)
+        if not news_ids:
+            return set()
+        marks = ",".join("?" * len(news_ids))
+        rows = await self._query(f"SELECT news_id FROM pending WHERE guild_id = ? AND state = 'pending' "
+                                 f"AND news_id IN ({marks})", (guild_id, *news_ids))
+        return {r[0] for r in rows}
+
+    async def pending_older_than(self, guild_id: int, seconds: float) -> List[PendingItem]:
+        rows = await self._query(f"SELECT {self._COLUMNS} FROM pending WHERE guild_id = ? AND state = 'pending' "
+                                 "AND created_at < ? ORDER BY created_at", (guild_id, time.time() - seconds))
+        return [self._item(r) for r in rows]
+
+    async def decide(self, guild_id: int, ids: Iterable[int], state: str, moderator: str) -> int:
+        """Отмечает решение по id очереди; возвращает число изменённых записей"""
+        ids = list(ids)
+        if not ids:
+            return 0
+        marks = ",".join("?" * len(ids))
+        return await self._write(f"UPDATE pending SET state = ?, decided_by = ?, decided_at = ? "
+                                 f"WHERE guild_id = ? AND state = 'pending' AND id IN ({marks})",
+                                 (state, moderator, time.time(), guild_id, *ids))
+
+    async def decide_news(self, guild_id: int, news_id: str, state: str, moderator: str):
+        """То же по id новости — для решений через реакции и дайджест"""
+        await self._write("UPDATE pending SET state = ?, decided_by = ?, decided_at = ? "
+                          "WHERE guild_id = ? AND news_id = ? AND state = 'pending'",
+                          (state, moderator, time.time(), guild_id, news_id))
+
+
+# глобальный экземпляр
+pending = PendingStore()
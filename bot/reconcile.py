@@ -0,0 +1,166 @@
+"""Сверка состояния каналов при старте и локальный индекс сообщений модерации.
+
+Один раз при запуске (и при переходе в ведущие) ког постранично читает канал
+модерации и канал публикаций каждого сервера: какие новости уже отправлены, какие
+реакции на них стоят, что уже опубликовано. Дальше индекс обновляется по ходу работы
+(отправки, реакции из gateway), и в штатном режиме история каналов не читается:
+восстановление реакций, проверка 📌 и поиск дублей идут по индексу.
+"""
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import discord
+
+from bot.config import config
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class IndexedMessage:
+    """Сообщение бота в канале модерации"""
+    guild_id: int
+    channel_id: int
+    message_id: int
+    embeds: List[dict]
+    # Эмодзи, которые стоят на сообщении (от кого угодно)
+    reactions: Set[str] = field(default_factory=set)
+    # Из них — поставленные самим ботом и поставленные кем-то ещё
+    mine: Set[str] = field(default_factory=set)
+    others: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def from_message(cls, guild_id: int, message: discord.Message) -> "IndexedMessage":
+        return cls(guild_id=guild_id, channel_id=message.channel.id, message_id=message.id,
+                   embeds=[e.to_dict() for e in message.embeds],
+                   reactions={str(r.emoji) for r in message.reactions},
+                   mine={str(r.emoji) for r in message.reactions if r.me},
+                   others={str(r.emoji) for r in message.reactions if r.count > (1 if r.me else 0)})
+
+    @property
+    def news_ids(self) -> List[str]:
+        return [e["url"] for e in self.embeds if e.get("url")]
+
+    @property
+    def pinned(self) -> bool:
+        """📌 бота — новость из сообщения уже опубликована (📌 от кого-то ещё ничего не значит)"""
+        return "📌" in self.mine
+
+    @property
+    def created_at(self) -> datetime:
+        return discord.utils.snowflake_time(self.message_id)
+
+    def to_embeds(self) -> List[discord.Embed]:
+        return [discord.Embed.from_dict(e) for e in self.embeds]
+
+
+class ModerationIndex:
+    """Сообщения модерации по id и по (сервер, новость); на сервер — не больше limit последних"""
+
+    def __init__(self, limit: int = config.RECONCILE_HISTORY_LIMIT):
+        self.limit = limit
+        self._messages: Dict[int, IndexedMessage] = {}
+        self._by_news: Dict[Tuple[int, str], int] = {}
+        self._order: Dict[int, Deque[int]] = {}
+        # Серверы, для которых сверка прошла: только им можно верить, что «нет в индексе» — значит нет
+        self._ready: Set[int] = set()
+
+    def ready(self, guild_id: int) -> bool:
+        return guild_id in self._ready
+
+    def mark_ready(self, guild_id: int):
+        self._ready.add(guild_id)
+
+    def reset(self, guild_id: int):
+        """Забывает сервер перед повторной сверкой"""
+        self._ready.discard(guild_id)
+        for message_id in self._order.pop(guild_id, ()):
+            self._forget(message_id)
+
+    def add(self, entry: IndexedMessage):
+        order = self._order.setdefault(entry.guild_id, deque())
+        if entry.message_id not in self._messages:
+            order.append(entry.message_id)
+        self._messages[entry.message_id] = entry
+        for nid in entry.news_ids:
+            self._by_news[(entry.guild_id, nid)] = entry.message_id
+        while len(order) > self.limit:
+            self._forget(order.popleft())
+
+    def _forget(self, message_id: int):
+        entry = self._messages.pop(message_id, None)
+        if entry is None:
+            return
+        for nid in entry.news_ids:
+            if self._by_news.get((entry.guild_id, nid)) == message_id:
+                del self._by_news[(entry.guild_id, nid)]
+
+    def message(self, message_id: int) -> Optional[IndexedMessage]:
+        return self._messages.get(message_id)
+
+    def find(self, guild_id: int, news_id: str) -> Optional[IndexedMessage]:
+        message_id = self._by_news.get((guild_id, news_id))
+        return self._messages.get(message_id) if message_id is not None else None
+
+    def reacted(self, message_id: int, emoji: str, mine: bool):
+        entry = self._messages.get(message_id)
+        if entry is not None:
+            entry.reactions.add(emoji)
+            (entry.mine if mine else entry.others).add(emoji)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+async def scan_moderation(channel, bot_id: int, guild_id: int, limit: int) -> List[IndexedMessage]:
+    """Сообщения бота с embed'ами из последних limit сообщений канала, старые первыми"""
+    entries = []
+    async for m in channel.history(limit=limit, oldest_first=False):
+        if m.author.id != bot_id or not m.embeds:
+            continue
+        entries.append(IndexedMessage.from_message(guild_id, m))
+    entries.reverse()
+    return entries
+
+
+async def scan_published(target, limit: int, since: Optional[datetime]) -> Set[str]:
+    """Ссылки новостей, уже опубликованных в канале или форуме (посты не старше since)"""
+    if isinstance(target, discord.ForumChannel):
+        return await _scan_forum(target, limit, since)
+    urls = set()
+    if hasattr(target, 'history'):
+        async for m in target.history(limit=limit, after=since):
+            if m.embeds and m.embeds[0].url:
+                urls.add(m.embeds[0].url)
+    return urls
+
+
+async def _scan_forum(forum: discord.ForumChannel, limit: int, since: Optional[datetime]) -> Set[str]:
+    # Ссылка есть только в стартовом сообщении треда (его id совпадает с id треда)
+    threads = {t.id: t for t in forum.threads}
+    async for t in forum.archived_threads(limit=limit):
+        threads[t.id] = t
+    recent = sorted(threads.values(), key=lambda t: t.id, reverse=True)[:limit]
+    if since is not None:
+        recent = [t for t in recent if t.created_at is None or t.created_at >= since]
+
+    semaphore = asyncio.Semaphore(config.FANOUT_CONCURRENCY)
+
+    async def starter_url(thread) -> Optional[str]:
+        async with semaphore:
+            try:
+                message = await thread.fetch_message(thread.id)
+            except discord.HTTPException as e:
+                log.debug("Стартовое сообщение треда %s недоступно: %s", thread.id, e)
+                return None
+        return message.embeds[0].url if message.embeds else None
+
+    return {url for url in await asyncio.gather(*(starter_url(t) for t in recent)) if url}
+
+
+# глобальный экземпляр
+index = ModerationIndex()
@@ -0,0 +1,34 @@
+import logging
+from typing import Dict, List, Type
+from bot.config import config
+from bot.sources.base import NewsSource
+from bot.sources.mal import MALSource
+
+log = logging.getLogger(__name__)
+
+# Все известные типы источников: имя из Config.NEWS_SOURCES -> класс
+SOURCE_TYPES: Dict[str, Type[NewsSource]] = {
+    MALSource.name: MALSource,
+}
+
+
+def register_source(cls: Type[NewsSource]) -> Type[NewsSource]:
+    """Регистрирует новый тип источника (можно использовать как декоратор)"""
+    SOURCE_TYPES[cls.name] = cls
+    return cls
+
+
+def build_sources(names: List[str] = None) -> List[NewsSource]:
+    """Создаёт источники, перечисленные в конфиге (неизвестные имена пропускаются)"""
+    sources = []
+    for name in names if names is not None else config.NEWS_SOURCES:
+        cls = SOURCE_TYPES.get(name)
+        if cls is None:
+            log.warning("⚠️ Unknown news source '%s' — skipped.", name)
+            continue
+        sources.append(cls())
+    return sources
+
+
+def get_source(name: str) -> NewsSource:
+    return SOURCE_TYPES[name]()
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import aiohttp
+from typing import Callable, Dict, List, Optional
+from bot.config import config
+from bot.images import resolver
+from bot.metrics import NEWS_ITEMS, cache_lookup, stage
+from bot.parser import translate_to_ru
+
+log = logging.getLogger(__name__)
+
+
+class NewsSource:
+    """Базовый источник новостей.
+
+    Конвейер: fetch (список записей) → extract (догрузка статьи, только для новых)
+    → normalize (приведение к общему виду item-словаря). Наследники переопределяют стадии.
+    """
+
+    name = ""
+
+    def __init__(self, interval_minutes: Optional[int] = None, limit: Optional[int] = None):
+        self.interval_minutes = interval_minutes or int(
+            config.source_setting(self.name, "INTERVAL_MINUTES", config.CHECK_INTERVAL_MINUTES))
+        self.limit = limit or int(config.source_setting(self.name, "LIMIT", config.NEWS_LIMIT))
+
+    async def fetch(self, session: aiohttp.ClientSession, limit: int) -> List[Dict]:
+        """Возвращает сырые записи списка: {'title', 'link', 'image', 'excerpt'}"""
+        raise NotImplementedError
+
+    def entry_id(self, entry: Dict) -> str:
+        """Уникальный id записи (по умолчанию — ссылка)"""
+        return entry['link']
+
+    async def extract(self, session: aiohttp.ClientSession, entry: Dict) -> Dict:
+        """Догружает данные по отдельной записи (например, полный текст статьи)"""
+        return entry
+
+    def image_candidates(self, url: str) -> List[str]:
+        """Варианты картинки записи в порядке предпочтения; в embed попадёт первый рабочий"""
+        return [url]
+
+    def normalize(self, entry: Dict) -> Dict:
+        """Приводит запись к item-словарю, который понимает модерация"""
+        return {
+            'id': self.entry_id(entry),
+            'title': entry['title'],
+            'link': entry['link'],
+            'image': entry.get('image'),
+            'excerpt': entry.get('excerpt', ''),
+            'source': self.name,
+            # оригиналы до перевода/переписывания — по ним считается отпечаток для дедупликации
+            'original_title': entry['title'],
+            'original_excerpt': entry.get('excerpt', ''),
+        }
+
+    async def poll(self, limit: Optional[int] = None, is_known: Optional[Callable[[str], bool]] = None) -> List[Dict]:
+        """Полный проход по источнику.
+
+        Для известных id (is_known(id) == True) extract и перевод пропускаются —
+        возвращается только сырая запись с флагом known.
+        """
+        limit = limit or self.limit
+        log.info("🔍 [%s] Fetching %d latest news...", self.name, limit)
+        async with aiohttp.ClientSession() as session:
+            with stage("listing_fetch"):
+                entries = await self.fetch(session, limit)
+
+            known = [bool(is_known and is_known(self.entry_id(e))) for e in entries]
+            for is_old in known:
+                # «кеш» известных id: попадание экономит загрузку статьи и перевод
+                cache_lookup("seen", is_old)
+                NEWS_ITEMS.inc(source=self.name, outcome="known" if is_old else "new")
+            fresh = [e for e, k in zip(entries, known) if not k]
+            # статьи новых записей качаем параллельно — темп держит governor хоста
+            extracted = await asyncio.gather(*(self.extract(session, e) for e in fresh))
+
+            # normalize и перевод — блокирующий HTTP переводчика: в потоках, чтобы не стоял event loop
+            # (а с ним и циклы других источников, heartbeat и реакции)
+            prepared = iter(await asyncio.gather(*(asyncio.to_thread(self._prepare, e) for e in extracted)))
+            items = [self.known_item(entry) if is_old else next(prepared) for entry, is_old in zip(entries, known)]
+
+            # картинки новых записей: из кеша или проверкой кандидатов (известным не нужны)
+            await resolver.resolve_items(session, [i for i in items if not i.get('known')], self.image_candidates)
+
+        log.info("✅ [%s] Parsed %d news items (%d new).", self.name, len(items), len(fresh))
+        return items
+
+    def _prepare(self, entry: Dict) -> Dict:
+        """normalize и перевод текста новой записи (синхронно — вызывается в потоке)"""
+        item = self.normalize(entry)
+        # переводим на русский
+        if item.get('excerpt'):
+            item['excerpt'] = translate_to_ru(item['excerpt'])
+        return item
+
+    def known_item(self, entry: Dict) -> Dict:
+        """Item для уже известной записи: без статьи и перевода"""
+        item = NewsSource.normalize(self, entry)
+        item['known'] = True
+        return item
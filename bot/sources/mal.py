@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import re
+import aiohttp
+from typing import Dict, List
+from bot.config import config
+from bot.metrics import stage
+from bot.parser import fetch_page, fetch_feed_entries, fetch_full_text, translate_to_ru
+from bot.sources.base import NewsSource
+
+log = logging.getLogger(__name__)
+
+MAL_NEWS_URL = 'https://myanimelist.net/news'
+MAL_NEWS_RSS_URL = 'https://myanimelist.net/rss/news.xml'
+LISTING_MODES = ('rss', 'html')
+_deprecation_logged = False
+
+
+def fix_image_url(url: str) -> str:
+    """Исправляет уменьшенные картинки MAL до оригинального размера"""
+    if not url:
+        return url
+    # Пример: /r/100x156/s/common/... -> /s/common/...
+    if "/r/" in url and "/s/" in url:
+        start = url.find("/r/")
+        end = url.find("/s/")
+        fixed = url[:start] + url[end:]
+        return fixed
+    return url
+
+
+def parse_listing_html(html: str, limit: int) -> List[Dict]:
+    """Достаёт записи из HTML-страницы списка новостей MAL"""
+    # bs4 нужен только при HTML-фолбэке — не грузим его при старте
+    from bs4 import BeautifulSoup
+    with stage("html_parse"):
+        soup = BeautifulSoup(html, 'html.parser')
+    entries = []
+    for unit in soup.select('.news-unit')[:limit]:
+        a = unit.select_one('p.title a')
+        if not a:
+            continue
+
+        # безопасно получаем изображение
+        img = None
+        img_tag = unit.select_one('img')
+        if img_tag:
+            img = img_tag.get('data-src') or img_tag.get('src')
+
+        excerpt_tag = unit.select_one('.text')
+        entries.append({
+            'title': a.text.strip(),
+            'link': a['href'],
+            'image': img,
+            'excerpt': excerpt_tag.text.strip() if excerpt_tag else '',
+        })
+    return entries
+
+
+class MALSource(NewsSource):
+    """Новости MyAnimeList: RSS-фид (если включён) или HTML-страница списка"""
+
+    name = "mal"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.listing = self._listing_mode()
+
+    def _listing_mode(self) -> str:
+        """SOURCE_MAL_LISTING: "rss" (лёгкий XML-фид, при сбое — HTML) или "html"; NEWS_SOURCE — старое имя"""
+        global _deprecation_logged
+        mode = (config.source_setting(self.name, "LISTING") or "").lower()
+        if not mode and config.NEWS_SOURCE:
+            mode = config.NEWS_SOURCE
+            if not _deprecation_logged:
+                _deprecation_logged = True
+                log.warning("⚠️ NEWS_SOURCE устарел — используй SOURCE_MAL_LISTING=%s.", mode)
+        if mode and mode not in LISTING_MODES:
+            log.warning("⚠️ Unknown MAL listing mode '%s' — using rss.", mode)
+            mode = ''
+        return mode or 'rss'
+
+    async def fetch(self, session: aiohttp.ClientSession, limit: int) -> List[Dict]:
+        if self.listing == 'rss':
+            try:
+                entries = await fetch_feed_entries(session, MAL_NEWS_RSS_URL, limit)
+                if entries:
+                    return entries
+                log.warning("⚠️ RSS feed returned no items, falling back to HTML.")
+            except Exception as e:
+                log.warning("⚠️ RSS feed failed, falling back to HTML: %s", e)
+        html = await fetch_page(session, MAL_NEWS_URL)
+        # BeautifulSoup — чистый CPU, в потоке он не держит event loop
+        return await asyncio.to_thread(parse_listing_html, html, limit)
+
+    async def extract(self, session: aiohttp.ClientSession, entry: Dict) -> Dict:
+        # текст новости — пробуем вытянуть полный текст со страницы
+        full_text = await fetch_full_text(session, entry['link'])
+        return dict(entry, excerpt=full_text or entry['excerpt'])
+
+    def image_candidates(self, url: str) -> List[str]:
+        # Полноразмерная картинка по угаданному пути, при её отсутствии — превью из списка
+        full = fix_image_url(url)
+        return [full, url] if full != url else [url]
+
+    def normalize(self, entry: Dict) -> Dict:
+        item = super().normalize(entry)
+
+        # 🎯 Извлекаем оригинальное название аниме в одинарных кавычках
+        match = re.search(r"'([^']+)'", item['title'])
+        anime_name = match.group(1) if match else None
+
+        # Если нашли название в кавычках — используем только его, иначе переводим заголовок
+        if anime_name:
+            item['title'] = f"『{anime_name}』"
+        else:
+            item['title'] = translate_to_ru(item['title'])
+        return item
@@ -0,0 +1,53 @@
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Отсчёт от первого импорта этого модуля (run.py импортирует его первым)
+_T0 = time.perf_counter()
+
+
+class StartupReport:
+    """Время этапов запуска: импорт, загрузка storage, загрузка когов, до on_ready"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.reported = False
+
+    def mark(self, stage: str, seconds: float):
+        self.stages[stage] = seconds
+
+    @contextmanager
+    def stage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(stage, time.perf_counter() - started)
+
+    def since_start(self) -> float:
+        return time.perf_counter() - _T0
+
+    def summary(self) -> str:
+        parts = [f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.stages.items()]
+        rss_mb = peak_rss_mb()
+        if rss_mb is not None:
+            parts.append(f"peak RSS {rss_mb:.1f} MB")
+        return ", ".join(parts)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Пиковый RSS процесса; None — модуля resource нет (Windows)"""
+    if resource is None:
+        return None
+    # ru_maxrss на macOS — в байтах, на Linux и BSD — в килобайтах
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+startup = StartupReport()
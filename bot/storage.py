@@ -1,6 +1,11 @@
 import json
+import os
+import threading
 from pathlib import Path
-from typing import Set, Dict
+from typing import Set, Dict, Iterable, List, Optional
+from bot.config import config, GuildConfig
+from bot.dedup import FingerprintIndex
+from bot.metrics import stage
 
 DATA_FILE = Path('data/processed.json')
 
@@ -9,7 +14,35 @@ class Storage:
         self.path = path
         self._seen: Set[str] = set()
         self._published: Set[str] = set()
-        self._load()
+        # Настройки подписанных серверов: guild_id -> GuildConfig
+        self._guilds: Dict[int, GuildConfig] = {}
+        # Отпечатки содержимого (simhash) для поиска почти-дублей
+        self._fingerprints = FingerprintIndex(config.DEDUP_MAX_DISTANCE)
+        # Файл читается при первом обращении (или заранее через load() в фоне),
+        # чтобы импорт модуля не ждал диска
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Загружает данные с диска, если ещё не загружены. Потокобезопасно."""
+        with self._load_lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def reload(self):
+        """Перечитывает файл с диска (новый ведущий подхватывает состояние предыдущего)"""
+        with self._load_lock:
+            self._seen = set()
+            self._published = set()
+            self._guilds = {}
+            self._fingerprints = FingerprintIndex(config.DEDUP_MAX_DISTANCE)
+            self._load()
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
 
     def _load(self):
         if not self.path.exists():
@@ -26,6 +59,10 @@ class Storage:
             elif isinstance(data, dict):
                 self._seen = set(data.get('seen', []))
                 self._published = set(data.get('published', []))
+                for gid, guild in data.get('guilds', {}).items():
+                    self._guilds[int(gid)] = GuildConfig.from_dict(dict(guild, guild_id=gid))
+                for item_id, fp in data.get('fingerprints', {}).items():
+                    self._fingerprints.add(item_id, int(fp, 16))
             else:
                 self._seen = set()
                 self._published = set()
@@ -34,32 +71,91 @@ class Storage:
             self._published = set()
 
     def save(self):
+        self._ensure_loaded()
         self.path.parent.mkdir(parents=True, exist_ok=True)
         payload: Dict[str, list] = {
             'seen': list(self._seen),
-            'published': list(self._published)
+            'published': list(self._published),
+            'guilds': {str(gid): guild.to_dict() for gid, guild in self._guilds.items()},
+            'fingerprints': {item_id: format(fp, '016x') for item_id, fp in self._fingerprints.items()},
         }
-        with self.path.open('w', encoding='utf-8') as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        # Через временный файл и os.replace: читатель (резервный экземпляр) не увидит файл наполовину записанным
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with stage("storage_write"):
+            with tmp.open('w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
 
     def seen(self, item_id: str) -> bool:
         """Проверяет, есть ли новость уже в базе (отправлена в мод-канал)"""
+        self._ensure_loaded()
         return item_id in self._seen
 
-    def add(self, item_id: str):
-        """Добавляет новость в базу seen"""
+    def add(self, item_id: str, fingerprint: Optional[int] = None):
+        """Добавляет новость в базу seen (и её отпечаток в индекс дублей, если есть)"""
+        self._ensure_loaded()
         self._seen.add(item_id)
+        if fingerprint is not None:
+            self._fingerprints.add(item_id, fingerprint)
         self.save()
 
-    def published(self, item_id: str) -> bool:
-        """Проверяет, опубликована ли новость (в форуме/approved)."""
-        return item_id in self._published
+    def find_duplicate(self, fingerprint: Optional[int], exclude: str = None) -> Optional[str]:
+        """Возвращает id уже отправленной новости с почти таким же содержимым"""
+        self._ensure_loaded()
+        if fingerprint is None:
+            return None
+        return self._fingerprints.find(fingerprint, exclude=exclude)
+
+    @staticmethod
+    def published_key(item_id: str, guild_id: int = 0) -> str:
+        """Ключ публикации новости на сервере"""
+        # guild_id=0 — сервер из .env, для совместимости со старым форматом без префикса
+        return f"{guild_id}:{item_id}" if guild_id else item_id
+
+    def published(self, item_id: str, guild_id: int = 0) -> bool:
+        """Проверяет, опубликована ли новость (в форуме/approved) на сервере."""
+        self._ensure_loaded()
+        return self.published_key(item_id, guild_id) in self._published
 
-    def mark_published(self, item_id: str):
-        """Отмечает новость как опубликованную."""
-        self._published.add(item_id)
+    def mark_published(self, item_id: str, guild_id: int = 0):
+        """Отмечает новость как опубликованную на сервере."""
+        self._ensure_loaded()
+        self._published.add(self.published_key(item_id, guild_id))
         self.save()
 
+    def merge(self, seen: Iterable[str] = (), published: Iterable[str] = (), guild_id: int = 0) -> int:
+        """Добавляет найденное сверкой с каналами; одна запись на диск. Возвращает число новых отметок."""
+        self._ensure_loaded()
+        before = len(self._seen) + len(self._published)
+        self._seen.update(seen)
+        self._published.update(self.published_key(item_id, guild_id) for item_id in published)
+        added = len(self._seen) + len(self._published) - before
+        if added:
+            self.save()
+        return added
+
+    def guild_configs(self) -> List[GuildConfig]:
+        """Настройки всех подписанных серверов"""
+        self._ensure_loaded()
+        return list(self._guilds.values())
+
+    def get_guild_config(self, guild_id: int) -> Optional[GuildConfig]:
+        self._ensure_loaded()
+        return self._guilds.get(guild_id)
+
+    def set_guild_config(self, guild_cfg: GuildConfig):
+        """Подписывает сервер (или обновляет его настройки)"""
+        self._ensure_loaded()
+        self._guilds[guild_cfg.guild_id] = guild_cfg
+        self.save()
+
+    def remove_guild_config(self, guild_id: int) -> bool:
+        self._ensure_loaded()
+        removed = self._guilds.pop(guild_id, None) is not None
+        if removed:
+            self.save()
+        return removed
+
 
 # глобальный экземпляр
 storage = Storage()
@@ -0,0 +1,186 @@
+import asyncio
+import io
+import logging
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional
+
+from bot.config import config
+from bot.metrics import registry
+
+log = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = registry.histogram(
+    "senku_loop_lag_seconds", "Event loop scheduling lag",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+LOOP_STALLS = registry.counter(
+    "senku_loop_stalls_total", "Event loop stalls above LOOP_STALL_THRESHOLD_SECONDS")
+
+# Глубина стека в отчётах
+MAX_STACK_DEPTH = 40
+
+
+def _frame_stack(frame) -> List[str]:
+    """Стек от внешнего вызова к внутреннему: 'файл:строка функция'"""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append(f"{code.co_filename}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class LoopWatchdog:
+    """Следит за задержкой event loop и ловит то, что его блокирует.
+
+    Задача на loop спит interval секунд и меряет, насколько позже проснулась — это лаг.
+    Отдельный поток смотрит на время последнего пробуждения: если loop молчит дольше
+    порога, поток снимает стек потока loop прямо во время зависания (перевод, разбор
+    HTML, Storage.save...). Когда loop оживает, зависание пишется в лог вместе со стеком.
+    """
+
+    def __init__(self, interval: float = config.LOOP_LAG_INTERVAL_SECONDS,
+                 threshold: float = config.LOOP_STALL_THRESHOLD_SECONDS):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_lag = 0.0
+        # Последние зависания: {'at', 'lag', 'stack'}
+        self.stalls: Deque[Dict] = deque(maxlen=20)
+        self.profiling = False
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id = 0
+        self._last_beat = 0.0
+        # Стек, снятый потоком во время текущего зависания (забирает задача на loop)
+        self._stall_stack: Optional[List[str]] = None
+
+    def start(self):
+        """Запускает замеры; вызывать из работающего event loop"""
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if config.LOOP_DEBUG:
+            # Режим отладки asyncio сам пишет в лог 'Executing <Handle ...> took N seconds'
+            # для каждого колбэка дольше порога. Он заметно дороже, поэтому включается отдельно.
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.threshold
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample_lag())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample_lag(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(0.0, now - started - self.interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            stack, self._stall_stack = self._stall_stack, None
+            if lag >= self.threshold:
+                self._record_stall(lag, stack)
+
+    def _record_stall(self, lag: float, stack: Optional[List[str]]):
+        LOOP_STALLS.inc()
+        self.stalls.append({"at": time.time(), "lag": lag, "stack": stack})
+        if stack:
+            log.warning("🐢 Event loop stalled for %.0f ms, blocked in:\n  %s", lag * 1000, "\n  ".join(stack))
+        else:
+            log.warning("🐢 Event loop stalled for %.0f ms (stack not captured)", lag * 1000)
+
+    def _watch(self):
+        # Поток проверяет чаще, чем порог, чтобы успеть застать виновника
+        period = max(0.01, min(self.interval, self.threshold) / 2)
+        while not self._stop.wait(period):
+            silent = time.monotonic() - self._last_beat
+            if silent < self.interval + self.threshold or self._stall_stack is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._stall_stack = _frame_stack(frame)
+
+    # --- профилирование по запросу ---
+
+    async def profile(self, seconds: float, mode: str = "cprofile") -> str:
+        """Снимает профиль живого процесса за seconds секунд, возвращает текстовый отчёт"""
+        if self.profiling:
+            raise RuntimeError("profiling already in progress")
+        self.profiling = True
+        try:
+            if mode == "sample":
+                body = await asyncio.to_thread(self._sample_stacks, seconds, self._loop_thread_id or threading.get_ident())
+            else:
+                body = await self._cprofile(seconds)
+        finally:
+            self.profiling = False
+        return self.summary() + "\n\n" + body
+
+    async def _cprofile(self, seconds: float) -> str:
+        import cProfile
+        import pstats
+        # cProfile видит только поток, в котором включён, — это поток event loop
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out).strip_dirs()
+        stats.sort_stats("cumulative").print_stats(40)
+        stats.sort_stats("tottime").print_stats(20)
+        return out.getvalue()
+
+    def _sample_stacks(self, seconds: float, thread_id: int, period: float = 0.005) -> str:
+        """Сэмплирующий профиль потока loop: без накладных расходов на каждый вызов"""
+        leaf: Counter = Counter()
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                stack = _frame_stack(frame)
+                leaf[stack[-1]] += 1
+                stacks[tuple(stack[-8:])] += 1
+                samples += 1
+            time.sleep(period)
+        if not samples:
+            return "no samples"
+
+        lines = [f"{samples} samples every {period * 1000:.0f} ms", "", "Top frames (where the loop thread was):"]
+        for where, count in leaf.most_common(25):
+            lines.append(f"{count / samples:6.1%}  {where}")
+        lines += ["", "Top stacks (innermost last):"]
+        for stack, count in stacks.most_common(10):
+            lines.append(f"{count / samples:6.1%}")
+            lines.extend(f"    {f}" for f in stack)
+        return "\n".join(lines)
+
+    def summary(self) -> str:
+        count, total = LOOP_LAG_SECONDS.summary()
+        avg = total / count * 1000 if count else 0.0
+        lines = [f"loop lag: avg {avg:.1f} ms, max {self.max_lag * 1000:.0f} ms over {count} samples; "
+                 f"stalls >= {self.threshold * 1000:.0f} ms: {int(LOOP_STALLS.get())}"]
+        for stall in list(self.stalls)[-5:]:
+            when = time.strftime("%H:%M:%S", time.localtime(stall["at"]))
+            where = stall["stack"][-1] if stall["stack"] else "?"
+            lines.append(f"  {when} {stall['lag'] * 1000:.0f} ms in {where}")
+        return "\n".join(lines)
+
+
+watchdog = LoopWatchdog()
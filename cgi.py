@@ -1,2 +0,0 @@
-# fake cgi module for compatibility with googletrans on Python 3.13+
-def escape(s, quote=False): return s
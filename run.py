@@ -1,4 +1,7 @@
-from bot.main import run_bot
+from bot.startup import startup
+
+with startup.stage("import"):
+    from bot.main import run_bot
 
 if __name__ == "__main__":
     run_bot()